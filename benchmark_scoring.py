@@ -0,0 +1,98 @@
+"""
+Benchmark TrueLLM.find_relevant_context: the "python" inverted-index
+backend against the vectorized "numpy" backend on a large synthetic
+corpus, checking that both return the same rankings. With --workers the
+corpus is also learned in a process pool, checking that the model comes
+out identical to the serial one.
+
+    python benchmark_scoring.py --sentences 100000 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from llm import KABADDI_CORPUS, TrueLLM
+
+QUESTIONS = [
+    "what are the rules of kabaddi",
+    "who is the best raider",
+    "how many players in a team",
+    "kabaddi court size",
+    "how are points scored",
+]
+
+
+def synthetic_corpus(n_sentences, words_per_sentence=12, seed=1):
+    """Sentences of random words drawn from the built-in corpus"""
+    rng = random.Random(seed)
+    words = " ".join(KABADDI_CORPUS).split()
+    return [" ".join(rng.choice(words) for _ in range(words_per_sentence)) + "."
+            for _ in range(n_sentences)]
+
+
+def learned_state(model):
+    """Everything update() learns, in a form that compares by value and order"""
+    def ordered(table):
+        return [(key, list(counter.items())) for key, counter in table.items()]
+
+    return (list(model.word_to_id.items()), list(model.word_freq.items()),
+            ordered(model.ngram_model), ordered(model.cooccurrence),
+            model.sentences, model.corpus, model.sentence_matrix.toarray().tolist())
+
+
+def train(corpus, workers=1, **options):
+    """A TrueLLM learned from corpus, and the seconds it took"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = TrueLLM(sarcasm_mode=False, **options)
+        model.learn_from_corpus(corpus, workers=workers)
+    return model, time.perf_counter() - start
+
+
+def ms_per_query(model, repeat):
+    queries = [(model.tokenize(q), q) for q in QUESTIONS]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for tokens, question in queries:
+            model.find_relevant_context(tokens, question)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="also learn the corpus with this many processes and compare")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.sentences)
+    models = {}
+    for backend in ("python", "numpy"):
+        models[backend], seconds = train(corpus, scoring_backend=backend)
+        print(f"{backend:>6} backend: trained in {seconds:.1f} s")
+
+    if args.workers > 1:
+        parallel, seconds = train(corpus, args.workers, scoring_backend="numpy")
+        print(f"{args.workers} workers: trained in {seconds:.1f} s")
+        if learned_state(parallel) != learned_state(models["numpy"]):
+            raise SystemExit(f"Model learned with {args.workers} workers differs from the serial one")
+        print(f"Model learned with {args.workers} workers identical to serial")
+
+    for question in QUESTIONS:
+        tokens = models["python"].tokenize(question)
+        expected = models["python"].find_relevant_context(tokens, question)
+        if models["numpy"].find_relevant_context(tokens, question) != expected:
+            raise SystemExit(f"Rankings differ for {question!r}")
+    print(f"Rankings identical for {len(QUESTIONS)} questions")
+
+    timings = {backend: ms_per_query(model, args.repeat) for backend, model in models.items()}
+    for backend, ms in timings.items():
+        print(f"{backend:>6} backend: {ms:8.2f} ms/query")
+    print(f"speedup: {timings['python'] / timings['numpy']:.1f}x on {args.sentences} sentences")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark KabaddiEngine.match against the original cosine_similarity
+matcher and check that both pick the same question with bit-identical
+scores.
+
+    python benchmark_similarity.py --questions 20000
+"""
+import argparse
+import random
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from kabaddi_chatbot import VECTORIZER_PARAMS, KabaddiEngine, clean_text, kabaddi_data
+
+
+def synthetic_kb(n_questions, seed=1):
+    """The built-in knowledge base padded with random questions over its vocabulary"""
+    rng = random.Random(seed)
+    words = " ".join(kabaddi_data).split() + [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(6)) for _ in range(2000)
+    ]
+    data = dict(kabaddi_data)
+    while len(data) < n_questions:
+        question = " ".join(rng.choice(words) for _ in range(rng.randint(2, 7)))
+        data[question] = f"answer {len(data)}"
+    return data, words
+
+
+def original_match(vectorizer, question_vectors, user_input):
+    """The matcher before the fast path: cosine_similarity and a dense argmax"""
+    user_vector = vectorizer.transform([clean_text(user_input)])
+    similarity = cosine_similarity(user_vector, question_vectors)
+    best_match = similarity.argmax()
+    return best_match, similarity[0][best_match]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    data, words = synthetic_kb(args.questions)
+    rng = random.Random(2)
+    keys = list(data)
+    queries = [rng.choice(keys) for _ in range(args.queries // 2)]
+    queries += [" ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+                for _ in range(args.queries - len(queries))]
+
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    question_vectors = vectorizer.fit_transform([clean_text(q) for q in keys])
+    engine = KabaddiEngine(data, ann=False)
+
+    mismatches = 0
+    for query in queries:
+        best, score = original_match(vectorizer, question_vectors, query)
+        answer, fast_score = engine.match(query)
+        if answer != engine.answers[best] or fast_score != score:
+            mismatches += 1
+            print(f"Mismatch for {query!r}: {score!r} vs {fast_score!r}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} of {len(queries)} queries differ")
+    print(f"Bit-identical answers and scores for {len(queries)} queries")
+
+    start = time.perf_counter()
+    for query in queries:
+        original_match(vectorizer, question_vectors, query)
+    before = (time.perf_counter() - start) / len(queries) * 1000
+
+    start = time.perf_counter()
+    for query in queries:
+        engine.match(query)
+    after = (time.perf_counter() - start) / len(queries) * 1000
+
+    print(f"cosine_similarity: {before:.3f} ms/query")
+    print(f"sparse fast path:  {after:.3f} ms/query")
+    print(f"speedup: {before / after:.1f}x on {len(keys)} questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+from scipy import sparse
+
+
+class CooccurrenceStore(Mapping):
+    """
+    Word co-occurrence counts as a SciPy CSR matrix over its own token
+    lexicon. New counts are appended as (row, col, count) id triples to
+    chunked NumPy buffers and summed into the matrix once chunk_size
+    triples are waiting, or on the next read. store[word] returns a Counter
+    like the cooccurrence dict of Counters; most_common(word, k) reads the
+    matrix row directly.
+    """
+
+    def __init__(self, tokens=(), matrix=None, chunk_size=1 << 21):
+        self.tokens = list(tokens)  # token id -> token
+        self.token_ids = {t: i for i, t in enumerate(self.tokens)}
+        self.chunk_size = chunk_size
+        n = len(self.tokens)
+        self._matrix = sparse.csr_matrix((n, n), dtype=np.int64) if matrix is None else matrix
+
+        self._buffers = []  # (rows, cols, counts) arrays not yet in the matrix
+        self._buffered = 0
+
+    def token_id(self, token):
+        """Id of token, adding it to the lexicon if new"""
+        i = self.token_ids.get(token)
+        if i is None:
+            i = self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def add_window(self, tokens, window=5):
+        """Count every pair of tokens at most window positions apart, both ways"""
+        ids = np.fromiter((self.token_id(t) for t in tokens), dtype=np.int32, count=len(tokens))
+        rows, cols = [], []
+        for d in range(1, min(window, len(ids) - 1) + 1):
+            rows += [ids[:-d], ids[d:]]
+            cols += [ids[d:], ids[:-d]]
+        if rows:
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            self._append(rows, cols, np.ones(len(rows), dtype=np.int64))
+
+    def add_counts(self, cooccurrence):
+        """Add a {word: Counter} mapping or another CooccurrenceStore"""
+        if isinstance(cooccurrence, CooccurrenceStore):
+            # Remap the other lexicon onto ours, then take its triples as they are
+            id_map = np.array([self.token_id(t) for t in cooccurrence.tokens], dtype=np.int32)
+            matrix = cooccurrence.matrix.tocoo()
+            self._append(id_map[matrix.row], id_map[matrix.col], matrix.data.astype(np.int64))
+            return
+
+        rows, cols, counts = [], [], []
+        for word1, counter in cooccurrence.items():
+            row = self.token_id(word1)
+            for word2, count in counter.items():
+                rows.append(row)
+                cols.append(self.token_id(word2))
+                counts.append(count)
+        self._append(np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32),
+                     np.array(counts, dtype=np.int64))
+
+    def _append(self, rows, cols, counts):
+        self._buffers.append((rows, cols, counts))
+        self._buffered += len(counts)
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Sum the buffered triples into the matrix"""
+        n = len(self.tokens)
+        matrix = self._matrix
+        if matrix.shape != (n, n):
+            matrix = sparse.csr_matrix((matrix.data, matrix.indices,
+                                        np.pad(matrix.indptr, (0, n - matrix.shape[0]), mode="edge")),
+                                       shape=(n, n))
+        if self._buffers:
+            rows, cols, counts = (np.concatenate(parts) for parts in zip(*self._buffers))
+            matrix = matrix + sparse.csr_matrix((counts, (rows, cols)), shape=(n, n))
+            matrix.sort_indices()
+        self._matrix = matrix
+        self._buffers = []
+        self._buffered = 0
+
+    @property
+    def matrix(self):
+        """The CSR count matrix, rows and columns indexed by token id"""
+        if self._buffers or self._matrix.shape[0] != len(self.tokens):
+            self.flush()
+        return self._matrix
+
+    def row(self, word):
+        """(column ids, counts) of word's row, empty arrays for an unknown word"""
+        i = self.token_ids.get(word)
+        matrix = self.matrix
+        if i is None:
+            return matrix.indices[:0], matrix.data[:0]
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        return matrix.indices[start:end], matrix.data[start:end]
+
+    def most_common(self, word, k=10):
+        """Up to k (word, count) pairs that co-occur most with word; ties go to the earlier-seen word"""
+        cols, counts = self.row(word)
+        picks = np.arange(len(counts))
+        if len(counts) > k > 0:
+            cutoff = counts[np.argpartition(-counts, k - 1)[k - 1]]
+            picks = np.flatnonzero(counts >= cutoff)
+        order = picks[np.lexsort((cols[picks], -counts[picks]))][:k]
+        return [(self.tokens[cols[i]], int(counts[i])) for i in order]
+
+    def __getitem__(self, word):
+        cols, counts = self.row(word)
+        if not len(counts):
+            raise KeyError(word)
+        return Counter(dict(zip([self.tokens[i] for i in cols.tolist()], counts.tolist())))
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self.matrix.indptr)))
+
+    def __iter__(self):
+        for i in np.flatnonzero(np.diff(self.matrix.indptr)).tolist():
+            yield self.tokens[i]
+
+    def save(self, path):
+        """Write the lexicon and CSR arrays as .npy files in directory path"""
+        matrix = self.matrix
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "tokens.npy"), np.array(self.tokens, dtype=str))
+        np.save(os.path.join(path, "data.npy"), matrix.data)
+        np.save(os.path.join(path, "indices.npy"), matrix.indices)
+        np.save(os.path.join(path, "indptr.npy"), matrix.indptr)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved store; the matrix arrays are memory-mapped unless mmap=False"""
+        mode = "r" if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+
+        tokens = array("tokens").tolist()
+        matrix = sparse.csr_matrix((array("data"), array("indices"), array("indptr")),
+                                   shape=(len(tokens), len(tokens)), copy=False)
+        return cls(tokens, matrix)
@@ -1,6 +1,19 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from scipy import sparse
+import numpy as np
+import sklearn
+import argparse
+import hashlib
+import json
+import math
+import os
 import re
+import shutil
+import threading
+import time
+
+from answer_cache import AnswerCache
 
 # -------------------------------
 # Text Cleaning
@@ -85,44 +98,582 @@ kabaddi_data = {
 
 }
 
-questions = [clean_text(q) for q in kabaddi_data.keys()]
-answers = list(kabaddi_data.values())
+MATCH_THRESHOLD = 0.25
+FALLBACK_ANSWER = "Ask something related to Kabaddi."
+
+VECTORIZER_PARAMS = {"ngram_range": (1, 3), "stop_words": "english"}
+
+# Answer cache in front of kabaddi_chatbot(); a few questions make up most traffic
+CACHE_SIZE = 1024
+CACHE_TTL = None  # seconds, None = until the engine is replaced
+
+# Approximate search for very large knowledge bases: below ANN_MIN_SIZE
+# questions the exact search is fast enough and always used
+ANN_MIN_SIZE = 50000
+ANN_DEPTH = 64  # postings visited per query term; higher = better recall, slower
+
+# Fitted model artifact: a directory holding meta.json and one version
+# directory of .npy arrays per save, loaded with memory mapping so worker
+# processes share the pages
+ARTIFACT_FORMAT_VERSION = 3
+ARTIFACT_PATH = os.environ.get("KABADDI_ARTIFACT", "kabaddi_model")
+
+# Optional knowledge base file (JSON object or JSONL) used instead of kabaddi_data
+KB_PATH = os.environ.get("KABADDI_KB")
+KB_POLL_INTERVAL = 2.0  # seconds between checks for an edited KB file
+
+
+def kb_hash(data):
+    """Content hash of a knowledge base and the vectorizer settings fitted on it"""
+    payload = json.dumps(
+        {"version": ARTIFACT_FORMAT_VERSION,
+         "params": VECTORIZER_PARAMS,
+         "sklearn": sklearn.__version__,
+         "data": list(data.items())},
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# -------------------------------
+# Knowledge Base Files
+# -------------------------------
+def load_kb(path):
+    """
+    Load question -> answer pairs from a JSON object file, or from a JSONL
+    file with one {"question": ..., "answer": ...} object per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            data = {}
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if (not isinstance(entry, dict) or not isinstance(entry.get("question"), str)
+                        or not isinstance(entry.get("answer"), str)):
+                    raise ValueError(f"{path}:{line_no}: expected an object with string 'question' and 'answer'")
+                data[entry["question"]] = entry["answer"]
+        else:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError(f"{path}: expected a JSON object mapping questions to answers")
+            for question, answer in data.items():
+                if not isinstance(answer, str):
+                    raise ValueError(f"{path}: answer to {question!r} is not a string")
+
+    if not data:
+        raise ValueError(f"{path}: knowledge base is empty")
+    return data
 
 # -------------------------------
-# Vectorizer
+# Approximate Nearest Neighbours
 # -------------------------------
-vectorizer = TfidfVectorizer(
-    ngram_range=(1, 3),
-    stop_words="english"
-)
+class ImpactIndex:
+    """
+    Approximate search over the TF-IDF space: an inverted file whose posting
+    lists (term -> questions) are sorted by the question's weight for that
+    term. A query visits only the top `depth` postings of each of its terms,
+    so latency no longer grows with how common a term is, and the candidates
+    are then scored exactly.
+    """
+
+    def __init__(self, question_matrix_t, questions=None):
+        postings = question_matrix_t.tocsr()
+        self.indptr = postings.indptr
+        if questions is None:
+            rows = np.repeat(np.arange(postings.shape[0]), np.diff(postings.indptr))
+            order = np.lexsort((-postings.data, rows))
+            questions = postings.indices[order]
+        self.questions = questions  # passed in when memory-mapped from an artifact
 
-question_vectors = vectorizer.fit_transform(questions)
+    def candidates(self, user_vector, depth=None):
+        """
+        Sorted ids of the questions with the highest weights for the query's
+        terms, visiting depth postings per term (ANN_DEPTH when None)
+        """
+        if depth is None:
+            depth = ANN_DEPTH
+        starts = self.indptr[user_vector.indices]
+        ends = np.minimum(self.indptr[user_vector.indices + 1], starts + depth)
+        if not len(starts):
+            return np.zeros(0, dtype=self.questions.dtype)
+        return np.unique(np.concatenate([self.questions[i:j] for i, j in zip(starts, ends)]))
+
+# -------------------------------
+# Matching Engine
+# -------------------------------
+class KabaddiEngine:
+    """
+    TF-IDF matcher over a knowledge base. Loads a saved artifact when one
+    matches the knowledge base, otherwise fits the vectorizer. Large
+    knowledge bases are searched through an ImpactIndex unless ann=False.
+    New entries can be added without refitting, see add_entries().
+    """
+
+    def __init__(self, data, artifact_path=None, ann=None, ann_depth=None):
+        self.keys = list(data.keys())
+        self.answers = list(data.values())
+        self.kb_hash = kb_hash(data)
+
+        if ann is None:
+            ann = len(self.keys) >= ANN_MIN_SIZE
+        self.ann_depth = ann_depth  # None: ANN_DEPTH as it is set at query time
+
+        if not (artifact_path and self._load(artifact_path, ann)):
+            questions = [clean_text(q) for q in self.keys]
+            self.vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+            question_vectors = self.vectorizer.fit_transform(questions)
+
+            # Normalized exactly as cosine_similarity does and transposed once, so
+            # matching is one sparse product with identical scores
+            self.question_matrix = normalize(question_vectors)
+            self.question_matrix_t = self.question_matrix.T.tocsr()
+            self.ann_index = ImpactIndex(self.question_matrix_t) if ann else None
+
+        self.cache = AnswerCache(CACHE_SIZE, CACHE_TTL)
+
+        # Incremental updates (add_entries): row of every key, working
+        # vocabulary and document frequencies, and the rows still waiting for
+        # refresh() to weight them. Set up on the first add. refresh() builds
+        # under _refresh_lock and holds _lock only to copy state and swap.
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._generation = 0  # bumped on every change, part of the cache key
+        self._key_rows = None
+        self._vocabulary = None
+        self._df = None
+        self._pending = []
+
+    def add_entries(self, data):
+        """
+        Add question -> answer pairs without refitting the vectorizer. Only the
+        new questions are tokenized; document frequencies are kept up to date
+        and the question matrix and IDF weights are recomputed lazily by
+        refresh() on the next query. Known questions just get the new answer.
+        """
+        analyzer = self.vectorizer.build_analyzer()
+        with self._lock:
+            if self._key_rows is None:
+                self._key_rows = {key: i for i, key in enumerate(self.keys)}
+                self._df = np.bincount(self.question_matrix.indices,
+                                       minlength=len(self.vectorizer.idf_))
+            if self._vocabulary is None:
+                # Copied, the live vectorizer keeps serving queries until refresh()
+                self._vocabulary = dict(self.vectorizer.vocabulary_)
+
+            added = 0
+            for key, answer in data.items():
+                row = self._key_rows.get(key)
+                if row is not None:
+                    self.answers[row] = answer
+                    continue
+
+                counts = {}
+                for term in analyzer(clean_text(key)):
+                    term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+                self._pending.append(counts)
+                self._key_rows[key] = len(self.keys)
+                self.keys.append(key)
+                self.answers.append(answer)
+                added += 1
+
+            if len(self._df) < len(self._vocabulary):
+                grown = np.zeros(len(self._vocabulary), dtype=self._df.dtype)
+                grown[:len(self._df)] = self._df
+                self._df = grown
+            for counts in self._pending[len(self._pending) - added:]:
+                self._df[list(counts)] += 1
+
+            self.kb_hash = None  # recomputed by save()
+            self._generation += 1
+        self.cache.clear()
+        return added
+
+    def refresh(self, wait=True):
+        """
+        Fold entries queued by add_entries() into the IDF weights and question
+        matrix. The new matrices are built from a copy of the queue while
+        queries keep using the current ones, then swapped in; entries added
+        meanwhile stay queued. With wait=False it returns at once if another
+        refresh is already running.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending = list(self._pending)
+                vocabulary = dict(self._vocabulary)
+                df = self._df[:len(vocabulary)].copy()
+                n_docs = len(self.keys) - (len(self._pending) - len(pending))
+                old_vectorizer, old_matrix, ann = self.vectorizer, self.question_matrix, self.ann_index is not None
+            n_terms = len(vocabulary)
+
+            # Smooth IDF exactly as TfidfVectorizer computes it
+            idf = np.log((n_docs + 1) / (df.astype(np.float64) + 1)) + 1
+
+            # Existing rows only need rescaling by new/old IDF before the
+            # rows are renormalized; their term counts are not needed again
+            old_idf = np.asarray(old_vectorizer.idf_)
+            existing = old_matrix.tocsr() @ sparse.diags(idf[:len(old_idf)] / old_idf)
+            existing.resize((existing.shape[0], n_terms))
+
+            rows = [row for row, counts in enumerate(pending) for _ in counts]
+            cols = [term_id for counts in pending for term_id in counts]
+            values = [count for counts in pending for count in counts.values()]
+            added = sparse.csr_matrix((values, (rows, cols)), shape=(len(pending), n_terms),
+                                      dtype=np.float64) @ sparse.diags(idf)
+
+            vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+            vectorizer.vocabulary_ = vocabulary
+            vectorizer.idf_ = idf
+            question_matrix = normalize(sparse.vstack([existing, added], format="csr"))
+            question_matrix_t = question_matrix.T.tocsr()
+            ann_index = ImpactIndex(question_matrix_t) if ann else None
+
+            with self._lock:
+                (self.vectorizer, self.question_matrix, self.question_matrix_t, self.ann_index) = (
+                    vectorizer, question_matrix, question_matrix_t, ann_index)
+                self._pending = self._pending[len(pending):]
+                if not self._pending:
+                    self._vocabulary = None
+                self._generation += 1
+        finally:
+            self._refresh_lock.release()
+        self.cache.clear()
+
+    def _snapshot(self):
+        """
+        Vectorizer and matrices of one consistent state, refreshed first if
+        entries are pending and no other query is refreshing them already
+        """
+        if self._pending:
+            self.refresh(wait=False)
+        with self._lock:
+            return self.vectorizer, self.question_matrix, self.question_matrix_t, self.ann_index
+
+    def save(self, path):
+        """
+        Write the fitted vocabulary, IDF weights and the search-ready question
+        matrices (rows, transposed, and the ImpactIndex order if built) to path
+        """
+        self.refresh()
+        if self.kb_hash is None:
+            self.kb_hash = kb_hash(dict(zip(self.keys, self.answers)))
+        meta_path = os.path.join(path, "meta.json")
+        previous = self._read_meta(path) or {}
+
+        # Arrays go into a fresh version directory and meta.json is switched
+        # to it last: running engines may have the old files memory-mapped,
+        # so those are never rewritten
+        version = f"v-{time.time_ns()}-{os.getpid()}"
+        version_path = os.path.join(path, version)
+        os.makedirs(version_path)
+
+        def save_array(name, array):
+            np.save(os.path.join(version_path, name + ".npy"), array)
+
+        terms = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+        save_array("terms", np.array(terms, dtype=str))
+        save_array("idf", self.vectorizer.idf_)
+        # Stored exactly as queries use them so loading maps them with no copy
+        for prefix, matrix in (("rows", self.question_matrix), ("cols", self.question_matrix_t)):
+            save_array(prefix + "_data", matrix.data)
+            save_array(prefix + "_indices", matrix.indices)
+            save_array(prefix + "_indptr", matrix.indptr)
+        if self.ann_index is not None:
+            save_array("impact", self.ann_index.questions)
+
+        meta = {"format_version": ARTIFACT_FORMAT_VERSION,
+                "kb_hash": self.kb_hash,
+                "version": version,
+                "shape": list(self.question_matrix.shape),
+                "impact": self.ann_index is not None}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        # Keep the version just replaced for engines that read the old
+        # meta.json a moment ago; older ones are unlinked (mapped pages stay
+        # valid until unmapped, and on platforms that refuse they are left)
+        keep = {version, previous.get("version")}
+        for name in os.listdir(path):
+            if name.startswith("v-") and name not in keep:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, path, ann):
+        """Memory-map a saved artifact; False if missing or built from other data"""
+        meta = self._read_meta(path)
+        if (meta is None or meta.get("format_version") != ARTIFACT_FORMAT_VERSION
+                or meta.get("kb_hash") != self.kb_hash):
+            return False
+
+        def array(name):
+            return np.load(os.path.join(path, meta["version"], name + ".npy"), mmap_mode="r")
+
+        def matrix(prefix, shape):
+            return sparse.csr_matrix(
+                (array(prefix + "_data"), array(prefix + "_indices"), array(prefix + "_indptr")),
+                shape=shape, copy=False
+            )
+
+        try:
+            terms, idf = array("terms"), array("idf")
+            n_questions, n_terms = meta["shape"]
+            question_matrix = matrix("rows", (n_questions, n_terms))
+            question_matrix_t = matrix("cols", (n_terms, n_questions))
+            impact = array("impact") if ann and meta.get("impact") else None
+        except OSError:
+            return False  # version removed by a newer save in between, just fit
+
+        self.vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        self.vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms.tolist())}
+        self.vectorizer.idf_ = idf
+        self.question_matrix = question_matrix
+        self.question_matrix_t = question_matrix_t
+        self.ann_index = ImpactIndex(question_matrix_t, impact) if ann else None
+        return True
+
+    def similarity(self, user_input):
+        """Sparse 1 x N cosine similarity of a query to every known question"""
+        user_input = clean_text(user_input)
+        vectorizer, question_matrix, question_matrix_t, ann_index = self._snapshot()
+        user_vector = vectorizer.transform([user_input])
+
+        # Cosine similarity without sklearn's cosine_similarity: the query is
+        # renormalized the way it would (sequential sum of squares, so scores
+        # stay bit-identical) and the knowledge base side is prepared already
+        norm = 0.0
+        for value in user_vector.data.tolist():
+            norm += value * value
+        if norm != 0.0:
+            user_vector.data /= math.sqrt(norm)
+
+        if ann_index is None:
+            similarity = user_vector @ question_matrix_t
+        else:
+            similarity = self._approximate_similarity(user_vector, question_matrix, ann_index)
+        similarity.sort_indices()  # lowest index wins ties, like dense argmax
+        return similarity
+
+    def _approximate_similarity(self, user_vector, question_matrix, ann_index):
+        """Exact scores for the ImpactIndex candidates only, zero for everything else"""
+        rows = ann_index.candidates(user_vector, self.ann_depth)
+        candidates = question_matrix[rows]
+
+        # Sparse-sparse dot of each candidate row with the query, matching
+        # terms through the query's sorted term ids
+        terms, weights = user_vector.indices, user_vector.data
+        order = np.argsort(terms)
+        terms, weights = terms[order], weights[order]
+        pos = np.minimum(np.searchsorted(terms, candidates.indices), len(terms) - 1)
+        products = candidates.data * np.where(terms[pos] == candidates.indices, weights[pos], 0.0)
+        row_ids = np.repeat(np.arange(len(rows)), np.diff(candidates.indptr))
+        scores = np.bincount(row_ids, weights=products, minlength=len(rows))
+        hits = scores != 0
+        return sparse.csr_matrix(
+            (scores[hits], rows[hits], [0, int(hits.sum())]),
+            shape=(1, question_matrix.shape[0])
+        )
+
+    def match(self, user_input):
+        """Return (answer, score) of the closest known question"""
+        similarity = self.similarity(user_input)
+        if not similarity.nnz:
+            return self.answers[0], 0.0
+
+        best = similarity.data.argmax()
+        return self.answers[similarity.indices[best]], similarity.data[best]
+
+    def cached_match(self, user_input):
+        """match() through the answer cache, keyed on the cleaned question"""
+        cleaned = clean_text(user_input)
+        # The generation in the key keeps answers computed before a change out
+        return self.cache.get_or_compute((self._generation, cleaned), lambda: self.match(cleaned))
+
+    def top_k(self, user_input, k=3):
+        """Return up to k (question_key, answer, score) candidates, best first"""
+        if k < 0:
+            raise ValueError(f"k must be >= 0, got {k}")
+        similarity = self.similarity(user_input)
+        scores, indices = similarity.data, similarity.indices
+
+        picks = np.arange(len(scores))
+        if len(scores) > k > 0:
+            # Keep everything tied with the k-th best score, then rank that handful
+            cutoff = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            picks = np.flatnonzero(scores >= cutoff)
+
+        order = picks[np.lexsort((indices[picks], -scores[picks]))][:k]
+        return [(self.keys[indices[i]], self.answers[indices[i]], scores[i]) for i in order]
+
+    def match_batch(self, user_inputs):
+        """Return (answer, score) of the closest known question for each input"""
+        user_inputs = [clean_text(q) for q in user_inputs]
+        if not user_inputs:
+            return []
+
+        vectorizer, _, question_matrix_t, _ = self._snapshot()
+        user_vectors = vectorizer.transform(user_inputs)
+        similarity = normalize(user_vectors) @ question_matrix_t
+        similarity.sort_indices()  # sparse argmax picks the lowest index on ties, like dense argmax
+
+        best_matches = np.asarray(similarity.argmax(axis=1)).ravel()
+        scores = similarity.max(axis=1).toarray().ravel()
+        return [(self.answers[i], score) for i, score in zip(best_matches, scores)]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the shared engine, fitting it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                data = load_kb(KB_PATH) if KB_PATH else kabaddi_data
+                _engine = KabaddiEngine(data, ARTIFACT_PATH)
+    return _engine
+
+
+def add_kabaddi_entries(data):
+    """
+    Add question -> answer pairs to the shared engine without refitting it.
+    A reload of the KB file (set_knowledge_base/KBWatcher) starts from the
+    file again, so entries meant to stay should be written there as well.
+    """
+    return get_engine().add_entries(data)
+
+
+def warm_up():
+    """Fit the engine now instead of on the first question"""
+    return get_engine()
+
+
+def set_knowledge_base(data):
+    """
+    Build an engine for new data and swap it in. Queries already running keep
+    the engine they started with; new ones see the new engine only once it is
+    completely built.
+    """
+    global _engine
+    engine = KabaddiEngine(data, ARTIFACT_PATH)
+    with _engine_lock:
+        _engine = engine
+    return engine
+
+
+class KBWatcher(threading.Thread):
+    """Background thread that rebuilds the engine whenever the KB file changes"""
+
+    def __init__(self, path, interval=KB_POLL_INTERVAL):
+        super().__init__(name="kabaddi-kb-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._signature = self._file_signature()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                set_knowledge_base(load_kb(self.path))
+                print(f"Reloaded knowledge base from {self.path}")
+            except Exception as e:
+                # Any failed build keeps the previous engine and the watcher
+                # running, so the next fix to the file is still picked up
+                print(f"Could not reload knowledge base from {self.path}: {e!r}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def watch_kb(path=None, interval=KB_POLL_INTERVAL):
+    """Start a KBWatcher on path (default KABADDI_KB) and return it"""
+    watcher = KBWatcher(path or KB_PATH, interval)
+    watcher.start()
+    return watcher
 
 # -------------------------------
 # Chatbot Function
 # -------------------------------
 def kabaddi_chatbot(user_input):
-    user_input = clean_text(user_input)
-    user_vector = vectorizer.transform([user_input])
-
-    similarity = cosine_similarity(user_vector, question_vectors)
-    best_match = similarity.argmax()
-    score = similarity[0][best_match]
+    answer, score = get_engine().cached_match(user_input)
 
-    if score >= 0.25:
-        return answers[best_match]
+    if score >= MATCH_THRESHOLD:
+        return answer
     else:
-        return "Ask something related to Kabaddi."
+        return FALLBACK_ANSWER
+
+def kabaddi_chatbot_batch(user_inputs):
+    """Answer many questions at once; returns (answer, score) pairs in input order"""
+    return [
+        (answer if score >= MATCH_THRESHOLD else FALLBACK_ANSWER, score)
+        for answer, score in get_engine().match_batch(user_inputs)
+    ]
+
+def kabaddi_chatbot_top_k(user_input, k=3):
+    """Top-k (question_key, answer, score) matches, for "did you mean" suggestions"""
+    return get_engine().top_k(user_input, k)
 
 # -------------------------------
 # Console Chat
 # -------------------------------
-print("Kabaddi Chatbot Activated")
-print("Type 'exit' to quit\n")
-
-while True:
-    query = input("You: ")
-    if query.lower() == "exit":
-        print("Match finished")
-        break
-    print("Kabaddi Bot:", kabaddi_chatbot(query))
+def main():
+    global KB_PATH
+
+    parser = argparse.ArgumentParser(description="Kabaddi TF-IDF chatbot")
+    parser.add_argument("--build-artifact", metavar="PATH", nargs="?", const=ARTIFACT_PATH,
+                        help="fit the model, save it to PATH and exit")
+    parser.add_argument("--kb", metavar="FILE", default=KB_PATH,
+                        help="load the knowledge base from a JSON/JSONL file")
+    parser.add_argument("--watch", action="store_true",
+                        help="reload the --kb file whenever it changes")
+    args = parser.parse_args()
+    KB_PATH = args.kb
+
+    if args.build_artifact:
+        KabaddiEngine(load_kb(KB_PATH) if KB_PATH else kabaddi_data).save(args.build_artifact)
+        print("Saved model artifact to", args.build_artifact)
+        return
+
+    warm_up()
+    if args.watch:
+        if not KB_PATH:
+            parser.error("--watch needs --kb")
+        watch_kb(KB_PATH)
+    print("Kabaddi Chatbot Activated")
+    print("Type 'exit' to quit\n")
+
+    while True:
+        query = input("You: ")
+        if query.lower() == "exit":
+            print("Match finished")
+            break
+        print("Kabaddi Bot:", kabaddi_chatbot(query))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,423 @@
 import numpy as np
+from scipy import sparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 import re
-from collections import defaultdict, Counter
+import heapq
+import threading
+from collections import defaultdict, Counter, deque
 import random
 
+from answer_cache import AnswerCache
+from cooccurrence_store import CooccurrenceStore
+from ngram_sampler import NgramSampler
+from ngram_store import NgramStore
+
+
+class KeywordMatcher:
+    """
+    Finds which keyword groups occur in a text with one compiled regex scan.
+    The keywords are compiled as a trie so the regex stays fast with thousands
+    of them. Overlapping keywords are all reported: the trie matches the
+    longest keyword at each position, and every keyword that is a prefix of
+    that match also counts as matched.
+    """
+    
+    def __init__(self, groups):
+        trie = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                node = trie
+                for ch in keyword:
+                    node = node.setdefault(ch, {})
+                node.setdefault('', set()).add(group)
+        
+        # Longest match -> groups of every keyword along its trie path
+        self.groups_by_keyword = {}
+        stack = [(trie, '', frozenset())]
+        while stack:
+            node, prefix, inherited = stack.pop()
+            if '' in node:
+                inherited = inherited | node['']
+                self.groups_by_keyword[prefix] = inherited
+            for ch, child in node.items():
+                if ch:
+                    stack.append((child, prefix + ch, inherited))
+        
+        self.pattern = re.compile('(?=(' + self._trie_pattern(trie) + '))') if self.groups_by_keyword else None
+    
+    @classmethod
+    def _trie_pattern(cls, node):
+        """Regex for a trie node, preferring the longest continuation"""
+        branches = [re.escape(ch) + cls._trie_pattern(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ''
+        if '' in node:
+            return '(?:' + '|'.join(branches) + ')?'
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+    
+    def groups(self, text):
+        """Return the set of groups with at least one keyword in text (already lowercased)"""
+        if self.pattern is None:
+            return frozenset()
+        hits = set()
+        for match in self.pattern.finditer(text):
+            hits |= self.groups_by_keyword[match.group(1)]
+        return frozenset(hits)
+
+
+# Literal keyword lists checked against corpus sentences by find_relevant_context
+# and generate_response, matched together in one pass per sentence
+SENTENCE_KEYWORDS = {
+    # find_relevant_context boosts
+    'is_a_or_the': ['is a', 'is the'],
+    'contact_or_team_sport': ['contact', 'team sport'],
+    'origin': ['originated', 'origin', 'punjab', 'tamil', 'maharashtra', 'ancient india', '4000 years'],
+    'team_of_seven': ['seven players', 'teams of seven'],
+    'play_basics': ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath'],
+    'famous_players': ['pardeep narwal', 'anup kumar', 'pawan sehrawat', 'rahul chaudhari', 'fazel atrachali'],
+    'raider': ['raider'],
+    'raider_names': ['pardeep', 'pawan', 'naveen', 'rahul'],
+    'defence': ['defender', 'defensive'],
+    'pkl': ['pkl', 'pro kabaddi league'],
+    'rules_gameplay': ['raider', 'defender', 'chant', 'breath', 'tag', 'tackle', 'enters', 'attempts', 'returns', 'declared out'],
+    'rules_scoring': ['point', 'score', 'all out', 'super raid', 'super tackle', 'bonus'],
+    'how_played': ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath', 'defenders try', 'teams of seven'],
+    'scoring': ['point', 'score', 'all out', 'super raid', 'super tackle', 'raiders score', 'defenders score'],
+    
+    # generate_response sentence picks
+    'definition_answer': ['is a contact team sport'],
+    'origin_answer': ['originated', 'origin', 'ancient', 'punjab', 'tamil', 'maharashtra', '4000 years'],
+    'rules_answer': ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath',
+                     'defenders try', 'tackle', 'catching', 'declared out', 'teams of seven',
+                     'stops chanting', 'takes a breath', 'returns successfully'],
+    'rules_scoring_answer': ['raiders score', 'defenders score', 'all out', 'super raid', 'super tackle', 'bonus points'],
+    'play_answer': ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath',
+                    'defenders try', 'teams of seven', 'compete', 'takes turns'],
+    'scoring_answer': ['point', 'score', 'all out', 'super raid', 'super tackle', 'bonus', 'raiders score'],
+    'meters': ['meters'],
+    'court': ['court'],
+    'player_names': ['pardeep', 'anup', 'pawan', 'rahul', 'fazel', 'naveen', 'sandeep', 'manjeet'],
+}
+
+KEYWORD_MATCHER = KeywordMatcher(SENTENCE_KEYWORDS)
+
+
+# Question intents that boost sentences in find_relevant_context.
+# Each rule: (name, question test, sentence test, boost). The sentence test gets
+# the sentence's keyword groups and lowercased text and is precomputed at
+# training time; the question side is checked once per query.
+INTENT_RULES = [
+    ('definition',
+     lambda q: re.search(r'what.*is.*kabaddi', q),
+     lambda hits, s: 'is_a_or_the' in hits and 'contact_or_team_sport' in hits,
+     15),
+    ('origin',
+     lambda q: 'where' in q and any(w in q for w in ['origin', 'originate', 'come from', 'start']),
+     lambda hits, s: 'origin' in hits,
+     20),
+    ('team_size',
+     lambda q: re.search(r'how\s+many.*player', q) or re.search(r'player.*team', q),
+     lambda hits, s: 'team_of_seven' in hits,
+     20),
+    ('how_to_play',
+     lambda q: re.search(r'how.*play', q) or 'how is it played' in q,
+     lambda hits, s: 'play_basics' in hits,
+     15),
+    ('court_size',
+     lambda q: 'court' in q and ('size' in q or 'measure' in q or 'dimension' in q),
+     lambda hits, s: re.search(r'\d+\s*meters', s),
+     18),
+    ('famous_players',
+     lambda q: any(w in q for w in ['famous', 'best', 'top']) and 'player' in q,
+     lambda hits, s: 'famous_players' in hits,
+     15),
+    ('best_raiders',
+     lambda q: 'raider' in q and any(w in q for w in ['best', 'famous', 'top']),
+     lambda hits, s: 'raider' in hits and 'raider_names' in hits,
+     18),
+    ('defenders',
+     lambda q: 'defender' in q,
+     lambda hits, s: 'defence' in hits,
+     15),
+    ('pkl',
+     lambda q: 'pkl' in q or 'pro kabaddi league' in q,
+     lambda hits, s: 'pkl' in hits,
+     12),
+    ('rules_gameplay',
+     lambda q: any(w in q for w in ['rule', 'rules']),
+     lambda hits, s: 'rules_gameplay' in hits,
+     30),
+    ('rules_scoring',
+     lambda q: any(w in q for w in ['rule', 'rules']),
+     lambda hits, s: 'rules_scoring' in hits,
+     25),
+    ('how_played',
+     lambda q: 'how' in q and any(w in q for w in ['play', 'played']),
+     lambda hits, s: 'how_played' in hits,
+     30),
+    ('scoring',
+     lambda q: any(w in q for w in ['point', 'score', 'scoring']),
+     lambda hits, s: 'scoring' in hits,
+     25),
+]
+
+
+class Session:
+    """
+    Per-user chat state: sarcasm toggle, recent question history and RNG.
+    Cheap to create; many sessions can share one trained TrueLLM.
+    """
+    
+    def __init__(self, sarcasm_mode=True, repeat_window=3, seed=None, rng=None):
+        self.sarcasm_mode = sarcasm_mode
+        self.rng = rng if rng is not None else random.Random(seed)
+        
+        # Track recent questions for repetition detection: the last
+        # repeat_window question keys plus a running count of each key
+        self.question_history = deque(maxlen=repeat_window)
+        self.question_counts = Counter()
+    
+    def toggle_sarcasm(self):
+        """Toggle sarcasm mode on/off"""
+        self.sarcasm_mode = not self.sarcasm_mode
+        return self.sarcasm_mode
+    
+    @staticmethod
+    def question_key(question):
+        """Hash of a question with case and spacing normalized"""
+        return hash(' '.join(question.lower().split()))
+    
+    def remember_question(self, question):
+        """Add a question to the repetition window, O(1) regardless of window size"""
+        history = self.question_history
+        if history.maxlen is not None and len(history) == history.maxlen:
+            evicted = history[0]
+            self.question_counts[evicted] -= 1
+            if not self.question_counts[evicted]:
+                del self.question_counts[evicted]
+        
+        key = self.question_key(question)
+        history.append(key)
+        self.question_counts[key] += 1
+    
+    def repeat_count(self, question):
+        """How many times a question appears in the recent window"""
+        return self.question_counts[self.question_key(question)]
+
+
+def iter_documents(path, text_field="text"):
+    """
+    Yield documents one at a time from a .txt or .jsonl file, or from every
+    such file in a directory (sorted, recursively). In .txt files documents
+    are separated by blank lines; .jsonl lines are objects holding the text
+    under text_field, or plain JSON strings.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith((".txt", ".jsonl")):
+                    yield from iter_documents(os.path.join(root, name), text_field)
+        return
+    
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    text = record if isinstance(record, str) else record[text_field]
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f"{path}:{line_no}: expected a JSON string or an object with '{text_field}'") from e
+                yield text
+        else:
+            lines = []
+            for line in f:
+                if line.strip():
+                    lines.append(line.rstrip("\n"))
+                elif lines:
+                    yield " ".join(lines)
+                    lines = []
+            if lines:
+                yield " ".join(lines)
+
+
+def count_patterns(tokens, context_size, ngram_model, cooccurrence):
+    """Add the n-gram and ±5 word co-occurrence counts of one tokenized text"""
+    tokens = ['<START>'] * context_size + tokens + ['<END>']
+    
+    for i in range(len(tokens) - context_size):
+        context = tuple(tokens[i:i + context_size])
+        next_word = tokens[i + context_size]
+        ngram_model[context][next_word] += 1
+    
+    if isinstance(cooccurrence, CooccurrenceStore):
+        cooccurrence.add_window(tokens, 5)
+        return
+    
+    for i, word1 in enumerate(tokens):
+        for j in range(max(0, i-5), min(len(tokens), i+6)):
+            if i != j:
+                word2 = tokens[j]
+                cooccurrence[word1][word2] += 1
+
+
+def count_documents(texts, context_size, sparse_cooccurrence=False):
+    """
+    Token, n-gram and co-occurrence counts of a list of texts, and their
+    SentenceBatch for the retrieval index (a worker task)
+    """
+    word_freq = Counter()
+    ngram_model = defaultdict(Counter)
+    cooccurrence = CooccurrenceStore() if sparse_cooccurrence else defaultdict(Counter)
+    batch = SentenceBatch()
+    for text in texts:
+        tokens = TrueLLM.tokenize(text)
+        word_freq.update(tokens)
+        count_patterns(tokens, context_size, ngram_model, cooccurrence)
+        batch.add(text)
+    if sparse_cooccurrence:
+        cooccurrence.flush()
+        return (word_freq, dict(ngram_model), cooccurrence), batch.compact()
+    return (word_freq, dict(ngram_model), dict(cooccurrence)), batch.compact()
+
+
+class SentenceBatch:
+    """
+    Sentences of some texts, analyzed for the retrieval index: split,
+    tokenized, keyword-matched and tested against every intent rule. Term
+    ids are local to the batch (lexicon order), so a batch can be built
+    without touching a model and added to one later in a single step.
+    """
+
+    def __init__(self, texts=()):
+        self.lexicon = {}  # term -> batch-local id, in order of first occurrence
+        self.sentences = []  # (stripped sentence, lowercased sentence)
+        self.keywords = []  # SENTENCE_KEYWORDS groups of each sentence
+        self.features = []  # INTENT_RULES sentence tests, len(INTENT_RULES) flags per sentence
+        self.indptr = [0]  # sentence i has the distinct term ids indices[indptr[i]:indptr[i + 1]]
+        self.indices = []
+        for text in texts:
+            self.add(text)
+
+    def add(self, text):
+        """Append the sentences of one text"""
+        lexicon = self.lexicon
+        for sentence in re.split(r'[.!?]+', text):
+            if not sentence.strip():
+                continue
+
+            self.indices.extend(dict.fromkeys(
+                lexicon.setdefault(token, len(lexicon)) for token in TrueLLM.tokenize(sentence)
+            ))
+            self.indptr.append(len(self.indices))
+
+            sent_lower = sentence.lower()
+            hits = KEYWORD_MATCHER.groups(sent_lower)
+            self.sentences.append((sentence.strip(), sent_lower))
+            self.keywords.append(hits)
+            self.features.extend(bool(sentence_test(hits, sent_lower)) for _, _, sentence_test, _ in INTENT_RULES)
+
+    def compact(self):
+        """Pack the lists into NumPy arrays to send the batch between processes (no add() after this)"""
+        self.indptr = np.array(self.indptr, dtype=np.int64)
+        self.indices = np.array(self.indices, dtype=np.int32)
+        self.features = np.array(self.features, dtype=np.uint8)
+        return self
+
+
+def merge_counts(left, right):
+    """
+    Add the counts of right into left and return left. Keys new to left are
+    appended in right's order, so merging shards in corpus order gives the
+    same dict order as counting serially.
+    """
+    left[0].update(right[0])
+    pairs = [(left[1], right[1])]
+    if isinstance(left[2], CooccurrenceStore):
+        left[2].add_counts(right[2])
+    else:
+        pairs.append((left[2], right[2]))
+    for target, source in pairs:
+        for key, counter in source.items():
+            if key in target:
+                target[key].update(counter)
+            else:
+                target[key] = counter
+    return left
+
+
+def iter_chunks(texts, chunk_size):
+    """Group an iterable of texts into lists of chunk_size"""
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class TrueLLM:
     """
     A true language model that learns from raw text corpus
     Now with SARCASM MODE! 🎭
     """
     
-    def __init__(self, context_size=3, sarcasm_mode=True):
+    def __init__(self, context_size=3, sarcasm_mode=True, scoring_backend="python", repeat_window=3,
+                 cache_size=1024, cache_ttl=None, ngram_backend="dict", cooccurrence_backend="dict"):
+        if scoring_backend not in ("python", "numpy"):
+            raise ValueError(f"Unknown scoring backend: {scoring_backend}")
+        if ngram_backend not in ("dict", "array"):
+            raise ValueError(f"Unknown n-gram backend: {ngram_backend}")
+        if cooccurrence_backend not in ("dict", "sparse"):
+            raise ValueError(f"Unknown co-occurrence backend: {cooccurrence_backend}")
+        
+        # update() builds new data off to the side and swaps it in under
+        # index_lock; readers take it too, so they never see half an update.
+        # Writers (update, reset, the first sampler build) also serialize on
+        # update_lock, which readers never wait for.
+        self.index_lock = threading.RLock()
+        self.update_lock = threading.RLock()
+        self.index_generation = 0  # bumped on every swap, part of the cache key
+        
         self.context_size = context_size
-        self.sarcasm_mode = sarcasm_mode  # Toggle sarcasm on/off
+        self.repeat_window = repeat_window
+        self.scoring_backend = scoring_backend  # "python" (inverted index) or "numpy" (vectorized)
+        self.ngram_backend = ngram_backend  # "dict" (defaultdict of Counters) or "array" (NgramStore)
+        self.cooccurrence_backend = cooccurrence_backend  # "dict" or "sparse" (CooccurrenceStore)
         self.word_to_id = {}
         self.id_to_word = {}
         self.vocab_size = 0
+        self.word_freq = Counter()  # running token counts, words graduate into the vocabulary at 2
         
         self.ngram_model = defaultdict(Counter)
         self.cooccurrence = defaultdict(Counter)
         self.corpus = []
         
+        # Sentence table used for retrieval, extended by every update()
+        # Each row: (sentence id, original text, lowercased text, token-id set)
+        self.sentences = []
+        self.term_to_id = {}  # every sentence token, not just the >= 2 vocabulary
+        self.postings = []  # term id -> sentence ids containing it
+        self.intent_postings = {}  # intent rule name -> sentence ids it boosts
+        self.intent_features = {}  # intent rule name -> per-sentence 0/1 column
+        self.sentence_keywords = []  # sentence id -> SENTENCE_KEYWORDS groups it contains
+        self.sentence_ids_by_text = {}  # sentence text -> first sentence id with that text
+        self.keyword_sets = {}  # share one frozenset object between sentences with the same hits
+        
+        # Vectorized scoring ("numpy" backend): sentence x term matrix and
+        # sentence x intent rule feature matrix, both built from the table above
+        self.sentence_matrix = None
+        self.feature_matrix = None
+        
         # Sarcasm templates and triggers
         self.sarcasm_triggers = {
             'obvious_questions': [
@@ -41,8 +439,22 @@ class TrueLLM:
                 r'dinosaur',
                 r'time travel',
                 r'superhero'
+            ],
+            # Complex/thoughtful questions deserve praise
+            'praise': [
+                r'strategy',
+                r'technique',
+                r'why.*important',
+                r'how.*improve',
+                r'difference between',
+                r'compare.*to',
+                r'evolution',
+                r'history.*development',
+                r'psychological',
+                r'training.*method'
             ]
         }
+        self.compile_sarcasm_triggers()
         
         self.sarcasm_templates = {
             'obvious': [
@@ -71,77 +483,388 @@ class TrueLLM:
             ]
         }
         
-        self.question_history = []  # Track questions asked
+        # Everything above is learned or configured once and only read while
+        # answering; per-user state lives in Session objects. The default
+        # session keeps single-user use working and draws from the random module.
+        self.default_session = Session(sarcasm_mode, repeat_window, rng=random)
+        
+        # Deterministic part of answer() (retrieval + generate_response) keyed
+        # on the tokenized question; personality is still applied per call
+        self.response_cache = AnswerCache(cache_size, cache_ttl)
         
-    def tokenize(self, text):
+        self.reset()  # empty model that update() can extend
+    
+    def new_session(self, sarcasm_mode=None, seed=None):
+        """Create an independent chat session served by this model"""
+        if sarcasm_mode is None:
+            sarcasm_mode = self.default_session.sarcasm_mode
+        return Session(sarcasm_mode, self.repeat_window, seed=seed)
+    
+    @property
+    def sarcasm_mode(self):
+        return self.default_session.sarcasm_mode
+    
+    @sarcasm_mode.setter
+    def sarcasm_mode(self, value):
+        self.default_session.sarcasm_mode = value
+    
+    @property
+    def question_history(self):
+        return self.default_session.question_history
+    
+    @staticmethod
+    def tokenize(text):
         """Convert text to tokens"""
         text = text.lower()
         text = re.sub(r'[^a-z0-9\s\.\?\!]', '', text)
         tokens = text.split()
         return tokens
     
-    def build_vocabulary(self, texts):
-        """Build vocabulary from raw text"""
-        all_words = []
+    def reset(self):
+        """Forget everything learned so far"""
+        with self.update_lock, self.index_lock:
+            self.word_to_id = {w: i for i, w in enumerate(['<START>', '<END>', '<UNK>'])}
+            self.id_to_word = {i: w for w, i in self.word_to_id.items()}
+            self.vocab_size = len(self.word_to_id)
+            self.word_freq = Counter()
+            
+            if self.ngram_backend == "array":
+                self.ngram_model = NgramStore(self.context_size)
+            else:
+                self.ngram_model = defaultdict(Counter)
+            self.cooccurrence = self.new_cooccurrence()
+            self.corpus = []
+            
+            self.sentences = []
+            self.term_to_id = {}
+            self.postings = []
+            self.intent_postings = {name: [] for name, _, _, _ in INTENT_RULES}
+            self.intent_features = {name: bytearray() for name, _, _, _ in INTENT_RULES}
+            self.sentence_keywords = []
+            self.sentence_ids_by_text = {}
+            self.keyword_sets = {}
+            self.sentence_matrix = None
+            self.feature_matrix = None
+            if self.scoring_backend == "numpy":
+                self.build_score_matrices()  # empty, so an untrained model still answers
+            self.sampler = None  # NgramSampler for generate(), built on first use
+            self.index_generation += 1
+        self.response_cache.clear()
+    
+    def new_cooccurrence(self):
+        """Empty co-occurrence counts for the configured backend"""
+        if self.cooccurrence_backend == "sparse":
+            return CooccurrenceStore()
+        return defaultdict(Counter)
+    
+    def update_vocabulary(self, texts):
+        """Add token counts from texts; words reaching frequency 2 join the vocabulary"""
+        batch_freq = Counter()
         for text in texts:
-            tokens = self.tokenize(text)
-            all_words.extend(tokens)
-        
-        word_freq = Counter(all_words)
-        vocab = ['<START>', '<END>', '<UNK>'] + [w for w, c in word_freq.items() if c >= 2]
+            batch_freq.update(self.tokenize(text))
+        return self.graduate_words(batch_freq)
+    
+    def graduate_words(self, batch_freq):
+        """Add a batch's token counts to word_freq and promote words now seen twice"""
+        self.word_freq.update(batch_freq)
         
-        self.word_to_id = {w: i for i, w in enumerate(vocab)}
+        # In order of first occurrence within this batch
+        new_words = [w for w in batch_freq if self.word_freq[w] >= 2 and w not in self.word_to_id]
+        for w in new_words:
+            self.word_to_id[w] = self.vocab_size
+            self.id_to_word[self.vocab_size] = w
+            self.vocab_size += 1
+        return new_words
+    
+    def build_vocabulary(self, texts):
+        """Build vocabulary from raw text"""
+        self.word_to_id = {w: i for i, w in enumerate(['<START>', '<END>', '<UNK>'])}
         self.id_to_word = {i: w for w, i in self.word_to_id.items()}
-        self.vocab_size = len(vocab)
+        self.vocab_size = len(self.word_to_id)
+        self.word_freq = Counter()
+        self.update_vocabulary(texts)
         
         print(f"Built vocabulary: {self.vocab_size} words")
-        return vocab
+        return list(self.word_to_id)
     
-    def learn_from_corpus(self, texts):
-        """Learn language patterns from raw text corpus"""
-        print("Learning from text corpus...")
+    def update(self, texts, keep_texts=True, workers=1, chunk_size=256):
+        """
+        Learn from more texts without retraining on what was already seen.
+        Vocabulary counts, n-grams, co-occurrences and the sentence index are
+        all extended. texts can be any iterable, e.g. iter_documents(); each
+        text is tokenized once and dropped after its counts are added (unless
+        keep_texts, which also appends it to self.corpus).
         
-        self.corpus = texts
-        self.build_vocabulary(texts)
+        The new counts and sentences are gathered off to the side and merged
+        into the model in one step under index_lock, so answer() keeps
+        serving the previous model until then and never sees a half-updated
+        one. A sampler already built for generate() gets the new n-gram
+        counts merged in rather than being rebuilt.
         
-        for text in texts:
-            tokens = ['<START>'] * self.context_size + self.tokenize(text) + ['<END>']
+        With workers > 1 the counting runs in a process pool, chunk_size texts
+        per task, and the partial counts are merged in order, so the result is
+        identical to workers=1.
+        """
+        if workers > 1:
+            counts, batches, kept = self._update_parallel(texts, keep_texts, workers, chunk_size)
+        else:
+            counts = (Counter(), defaultdict(Counter), self.new_cooccurrence())
+            batch = SentenceBatch()
+            kept = []
+            for text in texts:
+                if keep_texts:
+                    kept.append(text)
+                tokens = self.tokenize(text)
+                counts[0].update(tokens)
+                count_patterns(tokens, self.context_size, counts[1], counts[2])
+                batch.add(text)
+            batches = [batch]
+        
+        with self.update_lock:
+            # The read-only n-gram arrays (the array backend and the sampler)
+            # are merged first, outside index_lock and before anything else
+            # changes in case that fails
+            ngram_model, sampler = self.ngram_model, self.sampler
+            if self.ngram_backend == "array" or sampler is not None:
+                batch_ngrams = NgramStore.from_counts(counts[1], self.context_size)
+                if self.ngram_backend == "array":
+                    ngram_model = ngram_model.merged(batch_ngrams)
+                if sampler is not None:
+                    sampler = sampler.merged(batch_ngrams, ngram_model if self.ngram_backend == "array" else None)
             
-            for i in range(len(tokens) - self.context_size):
-                context = tuple(tokens[i:i + self.context_size])
-                next_word = tokens[i + self.context_size]
-                self.ngram_model[context][next_word] += 1
+            with self.index_lock:
+                if self.ngram_backend == "array":
+                    self.ngram_model = ngram_model
+                    merge_counts((Counter(), {}, self.cooccurrence), (Counter(), {}, counts[2]))
+                else:
+                    merge_counts((Counter(), self.ngram_model, self.cooccurrence), (Counter(),) + counts[1:])
+                self.corpus.extend(kept)
+                self.graduate_words(counts[0])
+                for batch in batches:
+                    self.add_sentences(batch)
+                if self.scoring_backend == "numpy":
+                    self.build_score_matrices()
+                self.sampler = sampler
+                self.index_generation += 1
+        self.response_cache.clear()
+        return self
+    
+    def _update_parallel(self, texts, keep_texts, workers, chunk_size):
+        """
+        update() counting sharded over a process pool; returns the merged
+        counts, the SentenceBatch of each chunk and the texts to keep
+        """
+        merged = []  # (level, counts) stack of the in-order tree reduction
+        batches = []
+        kept = []
+        
+        def merge_shard(chunk, future):
+            # The worker also analyzed the chunk's sentences; only their ids are left to map
+            counts, batch = future.result()
+            if keep_texts:
+                kept.extend(chunk)
+            batches.append(batch)
             
-            for i, word1 in enumerate(tokens):
-                for j in range(max(0, i-5), min(len(tokens), i+6)):
-                    if i != j:
-                        word2 = tokens[j]
-                        self.cooccurrence[word1][word2] += 1
+            level = 0
+            while merged and merged[-1][0] == level:
+                counts = merge_counts(merged.pop()[1], counts)
+                level += 1
+            merged.append((level, counts))
+        
+        with ProcessPoolExecutor(workers) as pool:
+            pending = deque()
+            for chunk in iter_chunks(texts, chunk_size):
+                pending.append((chunk, pool.submit(count_documents, chunk, self.context_size,
+                                                     self.cooccurrence_backend == "sparse")))
+                if len(pending) > 2 * workers:  # bounded, texts may be a stream
+                    merge_shard(*pending.popleft())
+            while pending:
+                merge_shard(*pending.popleft())
+        
+        counts = merged.pop()[1] if merged else (Counter(), {}, {})
+        while merged:
+            counts = merge_counts(merged.pop()[1], counts)
+        return counts, batches, kept
+    
+    def learn_from_files(self, path, text_field="text", workers=1):
+        """Learn from .txt/.jsonl files (or a directory of them) without loading them whole"""
+        print(f"Learning from {path}...")
+        
+        self.reset()
+        self.update(iter_documents(path, text_field), keep_texts=False, workers=workers)
         
+        print(f"Built vocabulary: {self.vocab_size} words")
         print(f"Learned {len(self.ngram_model)} n-gram patterns")
         print(f"Learned co-occurrences for {len(self.cooccurrence)} words")
+        print(f"Indexed {len(self.sentences)} sentences")
+    
+    def learn_from_corpus(self, texts, workers=1):
+        """Learn language patterns from raw text corpus"""
+        print("Learning from text corpus...")
+        
+        self.reset()
+        self.update(texts, workers=workers)
+        
+        print(f"Built vocabulary: {self.vocab_size} words")
+        print(f"Learned {len(self.ngram_model)} n-gram patterns")
+        print(f"Learned co-occurrences for {len(self.cooccurrence)} words")
+        print(f"Indexed {len(self.sentences)} sentences")
         print(f"🎭 Sarcasm mode: {'ENABLED' if self.sarcasm_mode else 'DISABLED'}")
     
-    def detect_sarcasm_trigger(self, question):
+    def index_sentences(self, texts):
+        """Append the sentences of texts to the retrieval index"""
+        batch = SentenceBatch(texts)
+        with self.index_lock:
+            self.add_sentences(batch)
+        return self.sentences
+    
+    def add_sentences(self, batch):
+        """Append an analyzed SentenceBatch to the retrieval index (hold index_lock)"""
+        id_map = np.fromiter((self.term_to_id.setdefault(term, len(self.term_to_id)) for term in batch.lexicon),
+                             dtype=np.int64, count=len(batch.lexicon))
+        term_ids = id_map[np.asarray(batch.indices, dtype=np.int64)]
+        indptr = np.asarray(batch.indptr).tolist()
+        offset = len(self.sentences)
+        
+        ids = term_ids.tolist()
+        for i, ((sentence, sent_lower), hits) in enumerate(zip(batch.sentences, batch.keywords)):
+            sent_id = offset + i
+            self.sentences.append((sent_id, sentence, sent_lower, frozenset(ids[indptr[i]:indptr[i + 1]])))
+            self.sentence_ids_by_text.setdefault(sentence, sent_id)
+            self.sentence_keywords.append(self.keyword_sets.setdefault(hits, hits))
+        
+        # Inverted index: token -> sentences, in sentence order
+        self.postings.extend([] for _ in range(len(self.term_to_id) - len(self.postings)))
+        if len(term_ids):
+            rows = np.repeat(np.arange(offset, len(self.sentences)), np.diff(indptr))
+            order = np.argsort(term_ids, kind="stable")
+            term_ids, rows = term_ids[order], rows[order]
+            starts = np.flatnonzero(np.r_[True, term_ids[1:] != term_ids[:-1]])
+            for token_id, sent_ids in zip(term_ids[starts].tolist(), np.split(rows, starts[1:])):
+                self.postings[token_id].extend(sent_ids.tolist())
+        
+        # Intent -> boosted sentences, and the per-sentence flags behind them
+        features = np.asarray(batch.features, dtype=np.uint8).reshape(len(batch.sentences), len(INTENT_RULES))
+        for r, (name, _, _, _) in enumerate(INTENT_RULES):
+            column = features[:, r]
+            self.intent_features[name].extend(column.tobytes())
+            self.intent_postings[name].extend((np.flatnonzero(column) + offset).tolist())
+    
+    def build_score_matrices(self):
+        """Build the sparse sentence x term matrix and intent feature matrix"""
+        lengths = np.fromiter((len(row[3]) for row in self.sentences), dtype=np.int64, count=len(self.sentences))
+        indptr = np.zeros(len(self.sentences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter((t for row in self.sentences for t in row[3]), dtype=np.int32, count=int(indptr[-1]))
+        data = np.ones(len(indices), dtype=np.int32)
+        
+        self.sentence_matrix = sparse.csr_matrix(
+            (data, indices, indptr), shape=(len(self.sentences), len(self.term_to_id))
+        )
+        self.feature_matrix = np.column_stack([
+            np.frombuffer(self.intent_features[name], dtype=np.uint8)
+            for name, _, _, _ in INTENT_RULES
+        ]).astype(np.int32) if self.sentences else np.zeros((0, len(INTENT_RULES)), dtype=np.int32)
+
+    
+    def compile_sarcasm_triggers(self, triggers=None):
+        """
+        Compile the trigger lists so one scan per category finds the candidate
+        patterns. triggers ({category: patterns}) replaces sarcasm_triggers;
+        everything is built first and swapped in together, so a pattern that
+        fails to compile leaves the current triggers in place.
+        """
+        triggers = self.sarcasm_triggers if triggers is None else triggers
+        
+        # Literal pieces of 'literal.*literal' patterns go into a KeywordMatcher;
+        # only patterns whose longest piece occurs in the question get run.
+        # Anything fancier is kept in a small list that is always checked.
+        matchers, regexes, unanchored = {}, {}, {}
+        for category, patterns in triggers.items():
+            anchors = {}
+            regexes[category] = [re.compile(p) for p in patterns]
+            unanchored[category] = []
+            
+            for i, pattern in enumerate(patterns):
+                pieces = pattern.split('.*')
+                if all(piece and not re.search(r'[\\^$.|?*+()\[\]{}]', piece) for piece in pieces):
+                    anchors[i] = [max(pieces, key=len)]
+                else:
+                    unanchored[category].append(i)
+            
+            matchers[category] = KeywordMatcher(anchors)
+        
+        with self.index_lock:
+            self.sarcasm_triggers = triggers
+            self.trigger_matchers = matchers
+            self.trigger_regexes = regexes
+            self.trigger_unanchored = unanchored
+    
+    def load_sarcasm_triggers(self, path):
+        """
+        Add trigger patterns from a file of 'category: pattern' lines ('#'
+        starts a comment). The file is applied only if every line is valid;
+        otherwise ValueError names the first bad line.
+        """
+        # 'repetitive' is detected from the session history, never by pattern
+        categories = sorted(c for c in self.sarcasm_triggers if c != 'repetitive')
+        triggers = {category: list(patterns) for category, patterns in self.sarcasm_triggers.items()}
+        with open(path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                category, sep, pattern = line.partition(':')
+                category, pattern = category.strip(), pattern.strip()
+                if not sep or not pattern or category not in categories:
+                    raise ValueError(f"{path}:{line_no}: expected '<category>: <pattern>' "
+                                     f"with category in {categories}")
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f"{path}:{line_no}: bad pattern {pattern!r}: {e}") from e
+                triggers[category].append(pattern)
+        
+        self.compile_sarcasm_triggers(triggers)
+    
+    def match_trigger(self, category, question_lower):
+        """Return the first trigger pattern of a category that matches the question, if any"""
+        with self.index_lock:  # one consistent set of tables, even during a reload
+            patterns = self.sarcasm_triggers[category]
+            matcher = self.trigger_matchers[category]
+            regexes = self.trigger_regexes[category]
+            unanchored = self.trigger_unanchored[category]
+        
+        candidates = matcher.groups(question_lower)
+        if unanchored:
+            candidates = candidates.union(unanchored)
+        
+        for i in sorted(candidates):
+            if regexes[i].search(question_lower):
+                return patterns[i]
+        return None
+    
+    def detect_sarcasm_trigger(self, question, session=None):
         """Detect if question deserves a sarcastic response"""
-        if not self.sarcasm_mode:
+        session = session or self.default_session
+        if not session.sarcasm_mode:
             return None, None
         
         question_lower = question.lower()
         
         # Check for obvious/silly questions
-        for pattern in self.sarcasm_triggers['obvious_questions']:
-            if re.search(pattern, question_lower):
-                return 'obvious', pattern
+        pattern = self.match_trigger('obvious_questions', question_lower)
+        if pattern:
+            return 'obvious', pattern
         
         # Check for absurd questions
-        for pattern in self.sarcasm_triggers['absurd']:
-            if re.search(pattern, question_lower):
-                return 'absurd', pattern
+        pattern = self.match_trigger('absurd', question_lower)
+        if pattern:
+            return 'absurd', pattern
         
-        # Check for repetitive questions - FIXED: Only exact same question asked consecutively
-        recent_questions = self.question_history[-3:] if len(self.question_history) >= 3 else self.question_history
-        if recent_questions.count(question_lower) >= 2:  # Asked at least twice in recent history
+        # Check for repetitive questions - asked at least twice within the recent window
+        if session.repeat_count(question_lower) >= 2:
             return 'repetitive', None
         
         # Check for "too easy" questions (basic facts asked in complex way)
@@ -150,8 +873,9 @@ class TrueLLM:
         
         return None, None
     
-    def generate_sarcastic_response(self, sarcasm_type, correct_answer, question):
+    def generate_sarcastic_response(self, sarcasm_type, correct_answer, question, session=None):
         """Generate a sarcastic response"""
+        rng = (session or self.default_session).rng
         question_lower = question.lower()
         
         # Generate wrong fact based on question
@@ -168,15 +892,15 @@ class TrueLLM:
             wrong_fact = "you're totally right, watching paint dry is more exciting"
         
         if sarcasm_type == 'obvious':
-            template = random.choice(self.sarcasm_templates['obvious'])
+            template = rng.choice(self.sarcasm_templates['obvious'])
             return template.format(wrong_fact=wrong_fact, correct_fact=correct_answer)
         
         elif sarcasm_type == 'absurd':
-            template = random.choice(self.sarcasm_templates['absurd'])
+            template = rng.choice(self.sarcasm_templates['absurd'])
             return template.format(correct_fact=correct_answer)
         
         elif sarcasm_type == 'too_easy':
-            template = random.choice(self.sarcasm_templates['too_easy'])
+            template = rng.choice(self.sarcasm_templates['too_easy'])
             return template.format(correct_fact=correct_answer)
         
         elif sarcasm_type == 'repetitive':
@@ -188,120 +912,82 @@ class TrueLLM:
         """Detect if question is genuinely good and deserves praise"""
         question_lower = question.lower()
         
-        # Complex/thoughtful questions deserve praise
-        good_question_indicators = [
-            r'strategy',
-            r'technique',
-            r'why.*important',
-            r'how.*improve',
-            r'difference between',
-            r'compare.*to',
-            r'evolution',
-            r'history.*development',
-            r'psychological',
-            r'training.*method'
-        ]
-        
-        for pattern in good_question_indicators:
-            if re.search(pattern, question_lower):
-                return True
-        
-        return False
+        return self.match_trigger('praise', question_lower) is not None
+    
+    def compile_intent_plan(self, question):
+        """Evaluate the question side of INTENT_RULES once, returning active boosts"""
+        question_lower = question.lower()
+        return [(name, boost) for name, question_test, _, boost in INTENT_RULES
+                if question_test(question_lower)]
     
     def find_relevant_context(self, question_tokens, original_question):
         """Find most relevant sentences from corpus based on question"""
-        question_words = set(question_tokens)
-        question_lower = original_question.lower()
-        
-        sentence_scores = []
-        
-        for text in self.corpus:
-            sentences = re.split(r'[.!?]+', text)
-            for sentence in sentences:
-                if not sentence.strip():
-                    continue
-                    
-                sent_lower = sentence.lower()
-                sent_tokens = set(self.tokenize(sentence))
-                
-                # Base overlap score
-                overlap = len(question_words & sent_tokens)
-                score = overlap * 2
-                
-                # Question type specific scoring
-                
-                # "What is kabaddi" - definition questions
-                if re.search(r'what.*is.*kabaddi', question_lower):
-                    if 'is a' in sent_lower or 'is the' in sent_lower:
-                        if 'contact' in sent_lower or 'team sport' in sent_lower:
-                            score += 15
-                
-                # "Where did kabaddi originate" - origin questions
-                if 'where' in question_lower and any(w in question_lower for w in ['origin', 'originate', 'come from', 'start']):
-                    if any(w in sent_lower for w in ['originated', 'origin', 'punjab', 'tamil', 'maharashtra', 'ancient india', '4000 years']):
-                        score += 20
-                
-                # "How many players" - team size questions
-                if re.search(r'how\s+many.*player', question_lower) or re.search(r'player.*team', question_lower):
-                    if 'seven players' in sent_lower or 'teams of seven' in sent_lower:
-                        score += 20
-                
-                # "How to play" questions
-                if re.search(r'how.*play', question_lower) or 'how is it played' in question_lower:
-                    if any(w in sent_lower for w in ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath']):
-                        score += 15
-                
-                # Court size questions
-                if 'court' in question_lower and ('size' in question_lower or 'measure' in question_lower or 'dimension' in question_lower):
-                    if re.search(r'\d+\s*meters', sent_lower):
-                        score += 18
-                
-                # Famous players questions
-                if any(w in question_lower for w in ['famous', 'best', 'top']) and 'player' in question_lower:
-                    if any(name in sent_lower for name in ['pardeep narwal', 'anup kumar', 'pawan sehrawat', 'rahul chaudhari', 'fazel atrachali']):
-                        score += 15
-                
-                # Raiders specifically
-                if 'raider' in question_lower and any(w in question_lower for w in ['best', 'famous', 'top']):
-                    if 'raider' in sent_lower and any(name in sent_lower for name in ['pardeep', 'pawan', 'naveen', 'rahul']):
-                        score += 18
-                
-                # Defenders specifically
-                if 'defender' in question_lower:
-                    if 'defender' in sent_lower or 'defensive' in sent_lower:
-                        score += 15
-                
-                # PKL questions
-                if 'pkl' in question_lower or 'pro kabaddi league' in question_lower:
-                    if 'pkl' in sent_lower or 'pro kabaddi league' in sent_lower:
-                        score += 12
-                
-                # Rules and scoring - CRITICAL FIX
-                if any(w in question_lower for w in ['rule', 'rules']):
-                    # Prioritize sentences about actual gameplay rules
-                    if any(w in sent_lower for w in ['raider', 'defender', 'chant', 'breath', 'tag', 'tackle', 'enters', 'attempts', 'returns', 'declared out']):
-                        score += 30
-                    # Also boost scoring rules
-                    if any(w in sent_lower for w in ['point', 'score', 'all out', 'super raid', 'super tackle', 'bonus']):
-                        score += 25
-                
-                # "How to play" questions
-                if 'how' in question_lower and any(w in question_lower for w in ['play', 'played']):
-                    if any(w in sent_lower for w in ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath', 'defenders try', 'teams of seven']):
-                        score += 30
+        with self.index_lock:  # one consistent snapshot while update() swaps in new data
+            # Question words the corpus has never seen cannot overlap with any sentence
+            question_words = {self.term_to_id[t] for t in question_tokens if t in self.term_to_id}
+            plan = self.compile_intent_plan(original_question)
+            
+            if self.scoring_backend == "numpy":
+                return self._find_relevant_context_numpy(question_words, plan)
+            
+            # Only sentences sharing a question token or boosted by an active
+            # intent can score above zero, so collect those from the index
+            candidates = set()
+            for token_id in question_words:
+                candidates.update(self.postings[token_id])
+            for name, _ in plan:
+                candidates.update(self.intent_postings[name])
+            
+            columns = [(self.intent_features[name], boost) for name, boost in plan]
+            
+            sentence_scores = []
+            
+            for sent_id in candidates:
+                _, sentence, _, sent_tokens = self.sentences[sent_id]
                 
-                # Specific scoring questions
-                if any(w in question_lower for w in ['point', 'score', 'scoring']):
-                    if any(w in sent_lower for w in ['point', 'score', 'all out', 'super raid', 'super tackle', 'raiders score', 'defenders score']):
-                        score += 25
+                # Base overlap score plus every active boost this sentence qualifies for
+                score = len(question_words & sent_tokens) * 2
+                for column, boost in columns:
+                    if column[sent_id]:
+                        score += boost
                 
                 if score > 0:
-                    sentence_scores.append((score, sentence.strip()))
+                    sentence_scores.append((score, -sent_id, sentence))
+            
+            # Top 5 by relevance, earlier sentences first on ties
+            top = heapq.nlargest(5, sentence_scores)
+            
+            return [s for _, _, s in top]
+    
+    def _find_relevant_context_numpy(self, question_words, plan):
+        """Vectorized find_relevant_context: same scores and ranking, no per-sentence loop"""
+        query = np.zeros(len(self.term_to_id), dtype=np.int32)
+        query[list(question_words)] = 1
+        
+        weights = np.zeros(len(INTENT_RULES), dtype=np.int32)
+        rule_index = {name: i for i, (name, _, _, _) in enumerate(INTENT_RULES)}
+        for name, boost in plan:
+            weights[rule_index[name]] = boost
         
-        # Sort by relevance
-        sentence_scores.sort(reverse=True, key=lambda x: x[0])
+        scores = self.sentence_matrix.dot(query) * 2 + self.feature_matrix.dot(weights)
         
-        return [s for _, s in sentence_scores[:5]]
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > 5:
+            # Keep everything tied with the 5th best score, then rank that handful
+            cutoff = np.partition(scores[hits], -5)[-5]
+            hits = hits[scores[hits] >= cutoff]
+        
+        # Highest score first, earlier sentence first on ties
+        order = np.lexsort((hits, -scores[hits]))[:5]
+        
+        return [self.sentences[i][1] for i in hits[order]]
+    
+    def keyword_groups(self, sentence):
+        """SENTENCE_KEYWORDS groups in a sentence, cached for corpus sentences"""
+        sent_id = self.sentence_ids_by_text.get(sentence.strip())
+        if sent_id is not None:
+            return self.sentence_keywords[sent_id]
+        return KEYWORD_MATCHER.groups(sentence.lower())
     
     def generate_response(self, context_sentences, original_question):
         """Generate clean, accurate response from learned text"""
@@ -309,40 +995,38 @@ class TrueLLM:
             return "I don't have enough information about that."
         
         question_lower = original_question.lower()
+        hits = [self.keyword_groups(sent) for sent in context_sentences]
         
         # For "what is kabaddi" - return the definition
         if re.search(r'what.*is.*kabaddi', question_lower):
-            for sent in context_sentences:
-                if 'is a contact team sport' in sent.lower():
+            for sent, sent_hits in zip(context_sentences, hits):
+                if 'definition_answer' in sent_hits:
                     return sent.strip()
         
         # For origin questions - combine relevant sentences
         if 'where' in question_lower and any(w in question_lower for w in ['origin', 'originate', 'come from', 'start']):
             origin_sents = []
-            for sent in context_sentences:
-                if any(w in sent.lower() for w in ['originated', 'origin', 'ancient', 'punjab', 'tamil', 'maharashtra', '4000 years']):
+            for sent, sent_hits in zip(context_sentences, hits):
+                if 'origin_answer' in sent_hits:
                     origin_sents.append(sent.strip())
             if origin_sents:
                 return ' '.join(origin_sents[:2])
         
         # For "how many players" questions
         if re.search(r'how\s+many.*player', question_lower) or 'players in a team' in question_lower:
-            for sent in context_sentences:
-                if 'seven players' in sent.lower() or 'teams of seven' in sent.lower():
+            for sent, sent_hits in zip(context_sentences, hits):
+                if 'team_of_seven' in sent_hits:
                     return sent.strip()
         
         # For rules questions - MAJOR FIX
         if any(w in question_lower for w in ['rule', 'rules']):
             rule_sents = []
-            for sent in context_sentences[:8]:  # Check more sentences
-                sent_lower = sent.lower()
+            for sent, sent_hits in zip(context_sentences[:8], hits):  # Check more sentences
                 # Prioritize actual gameplay rules
-                if any(w in sent_lower for w in ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath', 
-                                                   'defenders try', 'tackle', 'catching', 'declared out', 'teams of seven',
-                                                   'stops chanting', 'takes a breath', 'returns successfully']):
+                if 'rules_answer' in sent_hits:
                     rule_sents.append(sent.strip())
                 # Also include scoring rules
-                elif any(w in sent_lower for w in ['raiders score', 'defenders score', 'all out', 'super raid', 'super tackle', 'bonus points']):
+                elif 'rules_scoring_answer' in sent_hits:
                     rule_sents.append(sent.strip())
             
             if rule_sents:
@@ -352,10 +1036,8 @@ class TrueLLM:
         # For "how to play" questions
         if 'how' in question_lower and any(w in question_lower for w in ['play', 'played']):
             play_sents = []
-            for sent in context_sentences[:8]:
-                sent_lower = sent.lower()
-                if any(w in sent_lower for w in ['raider enters', 'attempts to tag', 'chant kabaddi', 'hold their breath',
-                                                   'defenders try', 'teams of seven', 'compete', 'takes turns']):
+            for sent, sent_hits in zip(context_sentences[:8], hits):
+                if 'play_answer' in sent_hits:
                     play_sents.append(sent.strip())
             
             if play_sents:
@@ -364,9 +1046,8 @@ class TrueLLM:
         # For specific scoring rules
         if any(w in question_lower for w in ['point', 'score', 'scoring', 'all out', 'super raid', 'super tackle']):
             score_sents = []
-            for sent in context_sentences[:5]:
-                sent_lower = sent.lower()
-                if any(w in sent_lower for w in ['point', 'score', 'all out', 'super raid', 'super tackle', 'bonus', 'raiders score']):
+            for sent, sent_hits in zip(context_sentences[:5], hits):
+                if 'scoring_answer' in sent_hits:
                     score_sents.append(sent.strip())
             
             if score_sents:
@@ -380,8 +1061,8 @@ class TrueLLM:
         # For court size questions
         if 'court' in question_lower and any(w in question_lower for w in ['size', 'measure', 'dimension']):
             court_sents = []
-            for sent in context_sentences:
-                if 'meters' in sent.lower() and 'court' in sent.lower():
+            for sent, sent_hits in zip(context_sentences, hits):
+                if 'meters' in sent_hits and 'court' in sent_hits:
                     court_sents.append(sent.strip())
             if court_sents:
                 return ' '.join(court_sents[:2])
@@ -389,8 +1070,8 @@ class TrueLLM:
         # For famous players questions
         if any(w in question_lower for w in ['famous', 'best', 'top']) and 'player' in question_lower:
             player_sents = []
-            for sent in context_sentences[:5]:
-                if any(name in sent.lower() for name in ['pardeep', 'anup', 'pawan', 'rahul', 'fazel', 'naveen', 'sandeep', 'manjeet']):
+            for sent, sent_hits in zip(context_sentences[:5], hits):
+                if 'player_names' in sent_hits:
                     player_sents.append(sent.strip())
             if player_sents:
                 return ' '.join(player_sents[:3])
@@ -402,35 +1083,93 @@ class TrueLLM:
         
         return response
     
-    def toggle_sarcasm(self):
+    def get_sampler(self):
+        """The NgramSampler for the current ngram_model, built on first use"""
+        sampler = self.sampler
+        if sampler is None:
+            # update_lock keeps writers off ngram_model while it is read;
+            # answer() only needs index_lock and carries on meanwhile
+            with self.update_lock:
+                sampler = self.sampler
+                if sampler is None:
+                    sampler = self.sampler = NgramSampler.from_counts(self.ngram_model, self.context_size)
+        return sampler
+    
+    def generate(self, prompt="", max_tokens=50, temperature=1.0, seed=None):
+        """
+        Continue prompt with up to max_tokens words sampled from the n-gram
+        model, stopping early at <END>. temperature below 1 sharpens the
+        distribution, above 1 flattens it, 0 always takes the most frequent
+        next word. seed makes the output repeatable.
+        """
+        return ' '.join(self.generate_stream(prompt, max_tokens, temperature, seed))
+    
+    def generate_stream(self, prompt="", max_tokens=50, temperature=1.0, seed=None):
+        """generate(), yielding each word as soon as it is sampled"""
+        sampler = self.get_sampler()
+        rng = random.Random(seed) if seed is not None else random
+        history = ['<START>'] * self.context_size + self.tokenize(prompt)
+        
+        for _ in range(max_tokens):
+            word = sampler.sample(history, rng, temperature)
+            if word is None or word == '<END>':
+                return
+            history.append(word)
+            yield word
+    
+    def generate_beam(self, prompt="", max_tokens=30, beam_width=8, length_penalty=1.0):
+        """
+        Continue prompt with the most likely word sequence found by beam
+        search instead of sampling; see NgramSampler.beam_search.
+        """
+        history = ['<START>'] * self.context_size + self.tokenize(prompt)
+        return ' '.join(self.get_sampler().beam_search(history, max_tokens, beam_width, length_penalty))
+    
+    async def agenerate_stream(self, prompt="", max_tokens=50, temperature=1.0, seed=None):
+        """Async iterator version of generate_stream() for event-loop frontends"""
+        if self.sampler is None:
+            await asyncio.to_thread(self.get_sampler)  # the first build must not stall the loop
+        for word in self.generate_stream(prompt, max_tokens, temperature, seed):
+            yield word
+            await asyncio.sleep(0)  # let other tasks run between words
+    
+    def toggle_sarcasm(self, session=None):
         """Toggle sarcasm mode on/off"""
-        self.sarcasm_mode = not self.sarcasm_mode
-        return self.sarcasm_mode
+        return (session or self.default_session).toggle_sarcasm()
+    
+    def base_response(self, q_tokens):
+        """Retrieval + generate_response for a tokenized question, None if nothing is relevant"""
+        # Built from the tokens alone so every question sharing a cache key gets the same answer
+        question = ' '.join(q_tokens)
+        with self.index_lock:
+            relevant_sentences = self.find_relevant_context(q_tokens, question)
+            if not relevant_sentences:
+                return None
+            return self.generate_response(relevant_sentences, question)
     
-    def answer(self, question):
+    def answer(self, question, session=None):
         """Answer a question using learned knowledge (with optional sarcasm!)"""
+        session = session or self.default_session
         question = question.strip()
         question_lower = question.lower()
         
         # Handle sarcasm toggle command
         if question_lower in ['toggle sarcasm', 'sarcasm on', 'sarcasm off', 'be sarcastic', 'stop sarcasm']:
-            new_mode = self.toggle_sarcasm()
+            new_mode = session.toggle_sarcasm()
             return f"🎭 Sarcasm mode is now {'ON' if new_mode else 'OFF'}! {'Prepare for sass!' if new_mode else 'Back to boring serious mode.'}"
         
         # Handle greetings
         if re.match(r'^(hi|hello|hey|hii)', question_lower):
-            if self.sarcasm_mode:
+            if session.sarcasm_mode:
                 return "Oh great, another human. What kabaddi wisdom do you seek? 🙄"
             return "Hello! I've learned about kabaddi from text. Ask me anything!"
         
         # Track question history for repetition detection (AFTER greetings check)
-        self.question_history.append(question_lower)
-        if len(self.question_history) > 10:
-            self.question_history.pop(0)
+        session.remember_question(question_lower)
         
         # Handle "can I play" questions
         if re.match(r'^(can|could|may) (i|we)', question_lower):
-            if self.sarcasm_mode:
+            if session.sarcasm_mode:
                 return "Can you play? I mean, do you have two legs and lungs? Then probably yes! Kabaddi requires teamwork, fitness, and strategy - but hey, you asked!"
             return "Yes, absolutely! Kabaddi is a sport anyone can play. It requires teamwork, fitness, and strategic thinking."
         
@@ -440,15 +1179,15 @@ class TrueLLM:
             if len(numbers) >= 2:
                 n1, n2 = numbers[0], numbers[1]
                 if (n1 == '13' and n2 == '10') or (n1 == '10' and n2 == '13'):
-                    if self.sarcasm_mode:
+                    if session.sarcasm_mode:
                         return "Wow, someone actually knows their measurements! Yes, that's correct! The kabaddi court is 13 meters by 10 meters for men's matches. Gold star for you! ⭐"
                     return "Yes, that's correct! The kabaddi court is 13 meters by 10 meters for men's matches."
                 elif (n1 == '12' and n2 == '8') or (n1 == '8' and n2 == '12'):
-                    if self.sarcasm_mode:
+                    if session.sarcasm_mode:
                         return "Look at you, getting it right! Yes, the women's kabaddi court is 12 meters by 8 meters. Impressive! 👏"
                     return "Yes, that's correct! The women's kabaddi court is 12 meters by 8 meters."
                 else:
-                    if self.sarcasm_mode:
+                    if session.sarcasm_mode:
                         return f"Nice try, but nope! Did you just make up random numbers? The kabaddi court measures 13m x 10m for men and 12m x 8m for women. Not {n1}m x {n2}m!"
                     return "No, that's not correct. The kabaddi court measures 13 meters by 10 meters for men and 12 meters by 8 meters for women."
         
@@ -465,44 +1204,46 @@ class TrueLLM:
         is_kabaddi = any(word in question_lower for word in kabaddi_words)
         
         if not is_kabaddi:
-            if self.sarcasm_mode:
+            if session.sarcasm_mode:
                 return "Um, I'm a KABADDI expert, not a general knowledge encyclopedia! Ask me about kabaddi, please! 🙄"
             return "I've learned about kabaddi. Please ask me kabaddi-related questions!"
         
         # Handle questions we don't have data for
         if any(word in question_lower for word in ['gold medal', 'olympics', 'medal', 'championship winner']):
-            if self.sarcasm_mode:
+            if session.sarcasm_mode:
                 return "Oh sure, let me just pull that out of my database... oh wait, I DON'T HAVE IT! I can tell you about kabaddi basics, players, rules, and PKL though. Try those?"
             return "I don't have information about that specific topic in my training data. I can tell you about kabaddi basics, players, rules, and the Pro Kabaddi League."
         
-        # Find relevant context from learned corpus
-        relevant_sentences = self.find_relevant_context(q_tokens, question)
+        # Find relevant context and generate the base response from learned patterns
+        # The generation in the key keeps answers from before an update() out
+        base_response = self.response_cache.get_or_compute(
+            (self.index_generation, ' '.join(q_tokens)), lambda: self.base_response(q_tokens)
+        )
         
-        if not relevant_sentences:
-            if self.sarcasm_mode:
+        if base_response is None:
+            if session.sarcasm_mode:
                 return "Wow, you stumped me! I haven't learned about that yet. Maybe try asking something I actually know? Like basics, players, rules, or PKL?"
             return "I haven't learned enough about that specific topic yet. Try asking about kabaddi basics, players, rules, or Pro Kabaddi League."
         
-        # Generate base response from learned patterns
-        base_response = self.generate_response(relevant_sentences, question)
-        
         # Check if we should add sarcasm or praise
-        if self.sarcasm_mode:
+        if session.sarcasm_mode:
             # Check for sarcasm triggers
-            sarcasm_type, _ = self.detect_sarcasm_trigger(question)
+            sarcasm_type, _ = self.detect_sarcasm_trigger(question, session)
             
             if sarcasm_type:
-                return self.generate_sarcastic_response(sarcasm_type, base_response, question)
+                return self.generate_sarcastic_response(sarcasm_type, base_response, question, session)
             
             # Check if question deserves praise
             if self.should_praise_question(question):
-                praise = random.choice(self.sarcasm_templates['praise'])
+                praise = session.rng.choice(self.sarcasm_templates['praise'])
                 return praise + base_response
         
         return base_response
     
-    def interactive_chat(self):
-        """Start interactive chat"""
+    def interactive_chat(self, stream=True):
+        """Start interactive chat; with stream, generated text is printed word by word"""
+        self.get_sampler()  # built now so the first 'generate' starts at once
+        
         print("\n" + "=" * 60)
         print("True LLM Kabaddi Chatbot - Learned from Text")
         if self.sarcasm_mode:
@@ -511,6 +1252,7 @@ class TrueLLM:
         print("I learned everything from reading about kabaddi!")
         print("Type 'quit' or 'exit' to end")
         print("Type 'toggle sarcasm' to switch modes")
+        print("Type 'generate: <words>' to make up text from what I read")
         print("=" * 60)
         print()
         
@@ -527,6 +1269,17 @@ class TrueLLM:
             if not user_input:
                 continue
             
+            if user_input.lower().startswith('generate:'):
+                words = self.generate_stream(user_input[len('generate:'):])
+                if stream:
+                    print("Bot:", end="", flush=True)
+                    for word in words:
+                        print(" " + word, end="", flush=True)
+                    print("\n")
+                else:
+                    print(f"Bot: {' '.join(words)}\n")
+                continue
+            
             response = self.answer(user_input)
             print(f"Bot: {response}\n")
 
@@ -0,0 +1,205 @@
+import heapq
+import math
+
+import numpy as np
+
+from ngram_store import NgramStore, changes
+
+BACKOFF_PENALTY = 0.4  # stupid backoff multiplier per context word dropped
+CACHE_SIZE = 1 << 16  # entries a lazily filled table cache holds before it starts over
+
+
+class NgramSampler:
+    """
+    Next-token tables for sampling from an n-gram model, as arrays on top of
+    an NgramStore. Level m holds the counts of every context cut down to its
+    last m tokens (level context_size is the store itself), with cumulative
+    counts per context, so a draw is one random number and a binary search;
+    each context's most frequent next token is precomputed for greedy
+    decoding. Unseen contexts back off to the longest seen suffix (stupid
+    backoff). merged() adds counts without rebuilding the tables, and
+    beam_search() decodes over them. A sampler never changes once built, so
+    any number of threads can share one.
+    """
+
+    def __init__(self, store, levels=None):
+        self.store = store
+        self.context_size = store.context_size
+        if levels is None:
+            levels = [store.suffix_counts(m) for m in range(store.context_size)] + [store]
+        self.levels = levels  # levels[m]: NgramStore of contexts of the last m tokens
+
+        # Per level: each entry's count plus those before it in its context,
+        # and the entry of each context's most frequent next token (the first on ties)
+        self.cumulative, self.best = [], []
+        for level in levels:
+            widths = np.diff(level.offsets)
+            starts = level.offsets[:-1]
+            if not len(level.counts):
+                self.cumulative.append(level.counts)
+                self.best.append(starts)
+                continue
+            running = np.cumsum(level.counts)
+            self.cumulative.append(running - np.repeat(running[starts] - level.counts[starts], widths))
+            tops = np.flatnonzero(level.counts == np.repeat(np.maximum.reduceat(level.counts, starts), widths))
+            self.best.append(tops[changes(np.repeat(np.arange(len(widths)), widths)[tops])])
+
+        # Filled on use, keyed by (level, row) so concurrent callers never mix tables
+        self._scaled = {}  # (temperature, level, row) -> cumulative weights at that temperature
+        self._log_probs = {}  # (level, row) -> log-probability array
+
+    @classmethod
+    def from_counts(cls, ngram_model, context_size):
+        """Sampler for a {context tuple: Counter} mapping or an NgramStore"""
+        if not isinstance(ngram_model, NgramStore):
+            ngram_model = NgramStore.from_counts(ngram_model, context_size)
+        return cls(ngram_model)
+
+    def merged(self, ngram_model, store=None):
+        """
+        New sampler with the counts of ngram_model (a mapping or an
+        NgramStore) added: every level merges in just those counts. store,
+        if given, is self.store with them already merged.
+        """
+        if not isinstance(ngram_model, NgramStore):
+            ngram_model = NgramStore.from_counts(ngram_model, self.context_size)
+        if store is None:
+            store = self.store.merged(ngram_model)
+        levels = [level.merged(ngram_model.suffix_counts(m), lexicon=store)
+                  for m, level in enumerate(self.levels[:-1])]
+        return NgramSampler(store, levels + [store])
+
+    def lookup(self, history):
+        """(level, row) of the longest seen suffix of history, None for an empty model"""
+        return self.backoff(history)[0]
+
+    def backoff(self, history):
+        """lookup() plus how many context words had to be dropped to find it"""
+        for m in range(self.context_size, -1, -1):
+            row = self.levels[m].find(history[len(history) - m:] if m else ())
+            if row >= 0:
+                return (m, row), self.context_size - m
+        return None, 0
+
+    def next_tokens(self, entry):
+        """The next tokens of a (level, row) table entry, in table order"""
+        m, row = entry
+        level = self.levels[m]
+        return [level.tokens[i] for i in level.next_ids[level.offsets[row]:level.offsets[row + 1]].tolist()]
+
+    def log_probs(self, entry):
+        """log P(token | context) of each next token of a table entry, from its count total"""
+        log_probs = self._log_probs.get(entry)
+        if log_probs is None:
+            m, row = entry
+            level = self.levels[m]
+            counts = level.counts[level.offsets[row]:level.offsets[row + 1]].astype(np.float64)
+            log_probs = np.log(counts) - math.log(counts.sum())
+            remember(self._log_probs, entry, log_probs)
+        return log_probs
+
+    def scaled(self, entry, temperature):
+        """
+        Cumulative weights of a table entry's next tokens with the counts
+        raised to 1 / temperature. The counts are divided by the largest
+        first, so no weight exceeds 1 and any temperature > 0 is safe: a
+        tiny one just underflows the rest to 0.
+        """
+        key = (temperature,) + entry
+        weights = self._scaled.get(key)
+        if weights is None:
+            m, row = entry
+            level = self.levels[m]
+            counts = level.counts[level.offsets[row]:level.offsets[row + 1]]
+            weights = np.cumsum((counts / counts.max()) ** (1.0 / temperature))
+            remember(self._scaled, key, weights)
+        return weights
+
+    def sample(self, history, rng, temperature=1.0):
+        """Draw the next token after history; None if the model is empty"""
+        entry = self.lookup(history)
+        if entry is None:
+            return None
+        m, row = entry
+        level = self.levels[m]
+        if temperature <= 0:
+            return level.tokens[level.next_ids[self.best[m][row]]]
+
+        start, end = level.offsets[row], level.offsets[row + 1]
+        cumulative = self.cumulative[m][start:end] if temperature == 1.0 else self.scaled(entry, temperature)
+        i = int(cumulative.searchsorted(rng.random() * cumulative[-1], side="right"))
+        return level.tokens[level.next_ids[start + min(i, end - start - 1)]]
+
+    def beam_search(self, history, max_tokens=30, beam_width=8, length_penalty=1.0, end='<END>'):
+        """
+        Most likely continuation of history (a token list) under the model,
+        as a token list. Finished hypotheses are ranked by total
+        log-probability divided by length ** length_penalty, so 0 favours
+        short outputs and larger values longer ones; backed-off steps pay the
+        stupid backoff penalty. Stops once beam_width hypotheses have ended,
+        or after max_tokens.
+        """
+        penalty = math.log(BACKOFF_PENALTY)
+        tail = list(history[len(history) - self.context_size:])
+        beams = [(0.0, ())]  # live hypotheses: (log-probability, tokens)
+        finished = []  # min-heap of the beam_width best (normalized score, tie, tokens)
+        tie = 0  # keeps heap comparisons off the token tuples
+
+        def finish(score, tokens):
+            nonlocal tie
+            tie += 1
+            item = (score / max(len(tokens), 1) ** length_penalty, tie, tokens)
+            if len(finished) < beam_width:
+                heapq.heappush(finished, item)
+            elif item[0] > finished[0][0]:
+                heapq.heapreplace(finished, item)
+
+        for _ in range(max_tokens):
+            # Score every next token of every live hypothesis in one array
+            scores, expanded, offsets = [], [], [0]
+            for score, tokens in beams:
+                entry, dropped = self.backoff(tail + list(tokens[-self.context_size:]))
+                if entry is None:
+                    finish(score, tokens)
+                    continue
+                next_tokens = self.next_tokens(entry)
+                scores.append(self.log_probs(entry) + (score + dropped * penalty))
+                expanded.append((tokens, next_tokens))
+                offsets.append(offsets[-1] + len(next_tokens))
+            if not scores:
+                beams = []
+                break
+
+            scores = np.concatenate(scores)
+            top = np.arange(len(scores))
+            if len(scores) > beam_width:
+                top = np.argpartition(-scores, beam_width - 1)[:beam_width]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            owners = np.searchsorted(offsets, top, side="right") - 1
+
+            live = []
+            for score, i, b in zip(scores[top].tolist(), top.tolist(), owners.tolist()):
+                tokens, next_tokens = expanded[b]
+                token = next_tokens[i - offsets[b]]
+                tokens = tokens + (token,)
+                if token == end:
+                    finish(score, tokens)
+                else:
+                    live.append((score, tokens))
+            beams = live
+            if not beams or len(finished) >= beam_width:
+                break
+
+        for score, tokens in beams:
+            finish(score, tokens)
+        if not finished:
+            return []
+        tokens = max(finished)[2]
+        return list(tokens[:-1] if tokens and tokens[-1] == end else tokens)
+
+
+def remember(cache, key, value):
+    """Store value in a bounded cache; when full it starts over (a reader racing that just misses)"""
+    if len(cache) >= CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
@@ -0,0 +1,250 @@
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class NgramStore(Mapping):
+    """
+    Read-only n-gram counts kept in sorted NumPy arrays instead of a dict of
+    Counters. Each context (a tuple of context_size tokens) is packed into one
+    fixed-width key: a uint64, or several big-endian 64-bit words compared
+    as raw bytes when the lexicon is too large for context_size ids to share
+    64 bits. store[context] returns a Counter of next tokens just like
+    ngram_model[context]. Grow it with merged(), which returns a new store.
+    """
+
+    def __init__(self, context_size, tokens=(), keys=None, offsets=None, next_ids=None, counts=None, token_ids=None):
+        self.context_size = context_size
+        if token_ids is None:
+            self.tokens = list(tokens)  # token id -> token, every token seen (own lexicon)
+            self.token_ids = {t: i for i, t in enumerate(self.tokens)}
+        else:
+            # A lexicon shared with other stores; stores never change one once built
+            self.tokens, self.token_ids = tokens, token_ids
+        self.bits = self.key_bits(len(self.tokens))
+        per_word = 64 // self.bits
+        # (first, end) context positions packed into each 64-bit key word;
+        # a context_size 0 store has the single context () with key 0
+        self.word_columns = [(start, min(start + per_word, context_size))
+                             for start in range(0, context_size, per_word)] or [(0, 0)]
+        self.key_dtype = np.dtype(np.uint64) if len(self.word_columns) == 1 else np.dtype(f"V{8 * len(self.word_columns)}")
+
+        # Context i is keys[i] (sorted); its next tokens are next_ids/counts[offsets[i]:offsets[i + 1]],
+        # in the order they were first seen (the order the Counter had)
+        self.keys = np.zeros(0, dtype=self.key_dtype) if keys is None else keys
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.next_ids = np.zeros(0, dtype=np.int32) if next_ids is None else next_ids
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+
+    @classmethod
+    def from_counts(cls, ngram_model, context_size):
+        """Build a store from a {context tuple: Counter} mapping"""
+        return cls(context_size).merged(ngram_model)
+
+    @staticmethod
+    def key_bits(n_tokens):
+        """Bits per token id in a packed context key"""
+        return max(1, (n_tokens - 1).bit_length())
+
+    def pack(self, context_ids):
+        """Pack an (n, context_size) array of token ids into keys"""
+        words = []
+        for start, end in self.word_columns:
+            word = np.zeros(len(context_ids), dtype=np.uint64)
+            for k in range(start, end):
+                word = (word << np.uint64(self.bits)) | context_ids[:, k].astype(np.uint64)
+            words.append(word)
+        if len(words) == 1:
+            return words[0]
+        return np.stack(words, axis=1).astype(">u8").view(self.key_dtype).ravel()
+
+    def unpack(self, keys):
+        """Inverse of pack(): (n, context_size) token ids"""
+        if not len(keys) or not self.context_size:
+            return np.zeros((len(keys), self.context_size), np.int64)
+        words = [keys] if len(self.word_columns) == 1 else \
+            keys.view(">u8").reshape(len(keys), -1).astype(np.uint64).T
+        mask = np.uint64((1 << self.bits) - 1)
+        columns = []
+        for word, (start, end) in zip(words, self.word_columns):
+            columns += [(word >> np.uint64(self.bits * (end - 1 - k))) & mask for k in range(start, end)]
+        return np.stack(columns, axis=1).astype(np.int64)
+
+    def find(self, context):
+        """Row of context in keys, or -1 if it was never seen"""
+        ids = [self.token_ids.get(t) for t in context]
+        if len(ids) != self.context_size or None in ids:
+            return -1
+        words = []
+        for start, end in self.word_columns:
+            word = 0
+            for token_id in ids[start:end]:
+                word = (word << self.bits) | token_id
+            words.append(word)
+        key = np.uint64(words[0]) if len(words) == 1 else np.array(words, dtype=">u8").view(self.key_dtype)[0]
+        i = int(self.keys.searchsorted(key))
+        return i if i < len(self.keys) and self.keys[i] == key else -1
+
+    def next_counts(self, context):
+        """(next token ids, counts) array views for context, or None if unseen"""
+        i = self.find(context)
+        if i < 0:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.next_ids[start:end], self.counts[start:end]
+
+    def __getitem__(self, context):
+        found = self.next_counts(context)
+        if found is None:
+            raise KeyError(context)
+        next_ids, counts = found
+        return Counter(dict(zip([self.tokens[i] for i in next_ids.tolist()], counts.tolist())))
+
+    def __contains__(self, context):
+        return self.find(context) >= 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        for ids in self.unpack(self.keys).tolist():
+            yield tuple(self.tokens[i] for i in ids)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the count arrays (the lexicon is not included)"""
+        return self.keys.nbytes + self.offsets.nbytes + self.next_ids.nbytes + self.counts.nbytes
+
+    def suffix_counts(self, m):
+        """
+        Store of these counts summed over the contexts that share their last
+        m tokens (the tables stupid backoff falls back to), on the same lexicon
+        """
+        store = NgramStore(m, self.tokens, token_ids=self.token_ids)
+        context_ids = self.unpack(self.keys)[:, self.context_size - m:]
+        keys = np.repeat(store.pack(context_ids), np.diff(self.offsets))
+        store.keys, store.offsets, store.next_ids, store.counts = group_entries(keys, self.next_ids, self.counts)
+        return store
+
+    def merged(self, ngram_model, lexicon=None):
+        """
+        New store with the counts of ngram_model added: a {context tuple:
+        Counter} mapping or another NgramStore. Only the new counts and the
+        contexts they touch are sorted; every other context is copied over
+        as it is. The lexicon is extended as needed (and shared with this
+        store while nothing is added), or taken from lexicon, a store whose
+        lexicon already holds every token.
+        """
+        if lexicon is not None:
+            tokens, token_ids = lexicon.tokens, lexicon.token_ids
+            token_id = token_ids.__getitem__
+        else:
+            tokens, token_ids = self.tokens, self.token_ids
+
+            def token_id(token):
+                nonlocal tokens, token_ids
+                i = token_ids.get(token)
+                if i is None:
+                    if tokens is self.tokens:  # copy on first write
+                        tokens, token_ids = list(tokens), dict(token_ids)
+                    i = token_ids[token] = len(tokens)
+                    tokens.append(token)
+                return i
+
+        # The new counts as token ids, one row per context, entries grouped by context
+        if isinstance(ngram_model, NgramStore):
+            id_map = np.fromiter((token_id(t) for t in ngram_model.tokens), dtype=np.int64,
+                                 count=len(ngram_model.tokens))
+            context_ids = id_map[ngram_model.unpack(ngram_model.keys)]
+            widths = np.diff(ngram_model.offsets)
+            next_ids = id_map[ngram_model.next_ids].astype(np.int32)
+            counts = ngram_model.counts
+        else:
+            context_ids, next_ids, counts, widths = [], [], [], []
+            for context, counter in ngram_model.items():
+                context_ids.append([token_id(t) for t in context])
+                widths.append(len(counter))
+                for next_word, count in counter.items():
+                    next_ids.append(token_id(next_word))
+                    counts.append(count)
+            context_ids = np.array(context_ids, dtype=np.int64).reshape(-1, self.context_size)
+            widths = np.array(widths, dtype=np.int64)
+            next_ids = np.array(next_ids, dtype=np.int32)
+            counts = np.array(counts, dtype=np.int64)
+
+        store = NgramStore(self.context_size, tokens, token_ids=token_ids)
+        old_keys = self.keys if store.bits == self.bits else store.pack(self.unpack(self.keys))
+        store.keys, store.offsets, store.next_ids, store.counts = old_keys, self.offsets, self.next_ids, self.counts
+        if not len(counts):
+            return store
+
+        # Where each new context goes among the existing ones, in key order
+        new_keys = store.pack(context_ids)
+        order = np.argsort(new_keys, kind="stable")
+        new_keys, new_starts, widths = new_keys[order], (np.cumsum(widths) - widths)[order], widths[order]
+        rows = old_keys.searchsorted(new_keys)
+        found = rows < len(old_keys)
+        found[found] = old_keys[rows[found]] == new_keys[found]
+
+        # Each touched context's old entries, then its new ones: summed per
+        # next token and kept in first-seen order
+        old_widths = np.diff(self.offsets)
+        touched = np.zeros(len(new_keys), dtype=np.int64)
+        touched[found] = old_widths[rows[found]]
+        old_take = ranges(np.where(found, self.offsets[np.minimum(rows, len(old_widths))], 0), touched)
+        new_take = ranges(new_starts, widths)
+        context = np.repeat(np.tile(np.arange(len(new_keys)), 2), np.concatenate([touched, widths]))
+        _, merged_offsets, merged_next, merged_counts = group_entries(
+            context, np.concatenate([self.next_ids[old_take], next_ids[new_take]]),
+            np.concatenate([self.counts[old_take], counts[new_take]]))
+        merged_starts, merged_widths = merged_offsets[:-1] + len(self.counts), np.diff(merged_offsets)
+
+        # Every context's (start, width) in old entries + merged entries, new contexts inserted in order
+        starts, lengths = self.offsets[:-1].copy(), old_widths.copy()
+        starts[rows[found]], lengths[rows[found]] = merged_starts[found], merged_widths[found]
+        inserted, at = ~found, rows[~found]
+        store.keys = np.insert(old_keys, at, new_keys[inserted])
+        starts = np.insert(starts, at, merged_starts[inserted])
+        lengths = np.insert(lengths, at, merged_widths[inserted])
+        take = ranges(starts, lengths)
+        store.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        store.next_ids = np.concatenate([self.next_ids, merged_next])[take]
+        store.counts = np.concatenate([self.counts, merged_counts])[take]
+        return store
+
+
+def group_entries(keys, next_ids, counts):
+    """
+    Sum the counts of entries with the same (context key, next id) and
+    group them by context: (sorted distinct keys, offsets, next ids,
+    counts), each context's next tokens in the order of their first entry
+    """
+    if not len(keys):
+        return keys, np.zeros(1, dtype=np.int64), next_ids, counts
+    order = np.lexsort((next_ids, keys))
+    sorted_keys, sorted_next = keys[order], next_ids[order]
+    starts = np.flatnonzero(changes(sorted_keys, sorted_next))
+    pair_keys, pair_next = sorted_keys[starts], sorted_next[starts]
+    pair_counts = np.add.reduceat(counts[order], starts)
+
+    order = np.lexsort((order[starts], pair_keys))
+    pair_keys = pair_keys[order]
+    context_starts = np.flatnonzero(changes(pair_keys))
+    return (pair_keys[context_starts], np.append(context_starts, len(pair_keys)).astype(np.int64),
+            pair_next[order], pair_counts[order])
+
+
+def changes(*columns):
+    """True at row 0 and wherever any of the equal-length columns differs from the row before"""
+    changed = np.zeros(len(columns[0]), dtype=bool)
+    changed[:1] = True
+    for column in columns:
+        changed[1:] |= column[1:] != column[:-1]
+    return changed
+
+
+def ranges(starts, lengths):
+    """Concatenation of the index ranges starts[i]:starts[i] + lengths[i]"""
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)